@@ -1,20 +1,284 @@
 from __future__ import annotations
 
-import locale
+import argparse
+import asyncio
+import heapq
+import os
 import re
-from datetime import datetime
-from typing import List, Optional
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import date as date_cls, datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+)
 
 import httpx
 from bs4 import BeautifulSoup
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from lxml import etree, html as lxml_html
 from pydantic import BaseModel
 
-BASE_URL = "https://www.anekdot.ru"
+from anekdot_search import SearchIndex
+
+try:
+    import orjson
+except ImportError:  # без orjson сериализует сам pydantic
+    orjson = None
+
+# ANEKDOT_BASE_URL можно направить на локальную подмену (anekdot_stub_server.py)
+BASE_URL = os.getenv("ANEKDOT_BASE_URL", "https://www.anekdot.ru").rstrip("/")
 BEST_DAY_URL = BASE_URL + "/release/anekdot/day/{date}/"
 RANDOM_URL = BASE_URL + "/random/anekdot/"
 
-app = FastAPI(title="HW2 – anekdot.ru proxy")
+# настройки пула соединений к anekdot.ru, можно переопределить через env
+HTTP_MAX_CONNECTIONS = int(os.getenv("ANEKDOT_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("ANEKDOT_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("ANEKDOT_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("ANEKDOT_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("ANEKDOT_READ_TIMEOUT", "10"))
+HTTP_POOL_TIMEOUT = float(os.getenv("ANEKDOT_POOL_TIMEOUT", "10"))
+# запрос считаем ждавшим соединение, если получал его дольше этого (сек); задержки
+# в единицы миллисекунд - это обычно занятый event loop (loop_lag в /stats/parse), а не пул
+HTTP_POOL_WAIT_THRESHOLD = float(os.getenv("ANEKDOT_POOL_WAIT_THRESHOLD", "0.02"))
+
+# кэш /best: сколько дней держим в памяти, где лежит SQLite (пусто - без диска)
+# и сколько живёт запись за сегодняшний день
+BEST_CACHE_SIZE = int(os.getenv("ANEKDOT_BEST_CACHE_SIZE", "256"))
+BEST_CACHE_DB = os.getenv("ANEKDOT_BEST_CACHE_DB", "anekdot_cache.sqlite3")
+BEST_TODAY_TTL = float(os.getenv("ANEKDOT_BEST_TODAY_TTL", "300"))
+
+# "сегодня" считаем по часам anekdot.ru, а не сервера
+try:
+    SITE_TZ = ZoneInfo("Europe/Moscow")
+except ZoneInfoNotFoundError:  # нет базы часовых поясов (Windows без tzdata) - в Москве UTC+3 без перевода часов
+    SITE_TZ = timezone(timedelta(hours=3))
+
+# буфер /random: ниже low фоновая задача начинает докачивать, до high - останавливается;
+# recent - сколько последних выданных текстов помним, чтобы не повторяться
+RANDOM_POOL_LOW = int(os.getenv("ANEKDOT_RANDOM_POOL_LOW", "20"))
+RANDOM_POOL_HIGH = int(os.getenv("ANEKDOT_RANDOM_POOL_HIGH", "100"))
+RANDOM_RECENT_SIZE = int(os.getenv("ANEKDOT_RANDOM_RECENT_SIZE", "1000"))
+# если сайт лежит, фоновая докачка повторяет через 1, 2, 4... сек, но не реже чем раз в RETRY_MAX
+RANDOM_RETRY_MIN = float(os.getenv("ANEKDOT_RANDOM_RETRY_MIN", "1"))
+RANDOM_RETRY_MAX = float(os.getenv("ANEKDOT_RANDOM_RETRY_MAX", "60"))
+
+# чем разбирать HTML: "bs4" (BeautifulSoup поверх lxml) или "lxml" (lxml напрямую, быстрее)
+HTML_BACKEND = os.getenv("ANEKDOT_HTML_BACKEND", "bs4")
+
+# где парсим HTML: "process" (пул процессов), "thread" (пул потоков) или "inline" (прямо в event loop);
+# PARSE_QUEUE - сколько разборов одновременно может быть отдано в пул, остальные ждут
+PARSE_EXECUTOR = os.getenv("ANEKDOT_PARSE_EXECUTOR", "process")
+PARSE_WORKERS = int(os.getenv("ANEKDOT_PARSE_WORKERS", str(os.cpu_count() or 2)))
+PARSE_QUEUE = int(os.getenv("ANEKDOT_PARSE_QUEUE", str(PARSE_WORKERS * 4)))
+LOOP_LAG_INTERVAL = float(os.getenv("ANEKDOT_LOOP_LAG_INTERVAL", "0.1"))
+
+# предохранитель на anekdot.ru: из последних WINDOW запросов (не меньше MIN_CALLS)
+# FAILURE_RATE и больше упало - перестаём ходить на OPEN_SECONDS, потом пускаем PROBES пробных
+BREAKER_WINDOW = int(os.getenv("ANEKDOT_BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("ANEKDOT_BREAKER_MIN_CALLS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("ANEKDOT_BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("ANEKDOT_BREAKER_OPEN_SECONDS", "30"))
+BREAKER_PROBES = int(os.getenv("ANEKDOT_BREAKER_PROBES", "1"))
+
+# насколько устаревший ответ ещё можно отдать, пока в фоне качается свежий (сек после TTL)
+BEST_MAX_STALE = float(os.getenv("ANEKDOT_BEST_MAX_STALE", "86400"))
+RANDOM_MAX_STALE = float(os.getenv("ANEKDOT_RANDOM_MAX_STALE", "600"))
+
+# /best/range: сколько дней качаем одновременно и какой самый длинный диапазон разрешаем
+RANGE_CONCURRENCY = int(os.getenv("ANEKDOT_RANGE_CONCURRENCY", "8"))
+RANGE_MAX_DAYS = int(os.getenv("ANEKDOT_RANGE_MAX_DAYS", "400"))
+
+# поиск по всем скачанным анекдотам: где хранить (пусто - только в памяти)
+SEARCH_DB = os.getenv("ANEKDOT_SEARCH_DB", "anekdot_search.sqlite3")
+
+# записи в SQLite идут фоном в отдельном потоке; за один коммит - не больше WRITE_BATCH
+WRITE_BATCH = int(os.getenv("ANEKDOT_WRITE_BATCH", "100"))
+
+
+def _http2_available() -> bool:
+    """HTTP/2 в httpx работает только если стоит пакет h2."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class TimedTransport(httpx.AsyncHTTPTransport):
+    """
+    Транспорт httpx, который меряет, сколько запрос ждал соединения: от входа в пул
+    httpcore до первого события httpcore по запросу (connect нового соединения или
+    отправка заголовков по готовому). В HTTP/2 сюда же входит ожидание свободного
+    потока в соединении. on_wait(секунды) зовётся на каждый запрос.
+    """
+
+    def __init__(self, on_wait: Callable[[float], None], **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._on_wait = on_wait
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        acquired: List[float] = []
+        outer = request.extensions.get("trace")
+
+        async def trace(event: str, info: dict) -> None:
+            if not acquired:
+                acquired.append(time.perf_counter())
+
+            if outer is not None:
+                await outer(event, info)
+
+        request.extensions["trace"] = trace
+
+        try:
+            return await super().handle_async_request(request)
+
+        except httpx.PoolTimeout:
+            # соединение так и не дали - ждали всё время
+            acquired.append(time.perf_counter())
+            raise
+
+        finally:
+            if acquired:
+                self._on_wait(acquired[0] - started)
+
+
+class UpstreamClient:
+    """
+    Один общий httpx.AsyncClient на всё приложение: соединения переиспользуются
+    (keep-alive), поэтому TCP+TLS рукопожатие не платим на каждый запрос.
+    Заодно считаем статистику пула, чтобы было понятно, как его размерить.
+    """
+
+    def __init__(self) -> None:
+        self.client: Optional[httpx.AsyncClient] = None
+        self.in_flight = 0
+        self.requests_total = 0
+        self.acquires = 0  # сколько раз замерили получение соединения
+        self.waits = 0  # сколько из них ждали дольше HTTP_POOL_WAIT_THRESHOLD
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def start(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    HTTP_READ_TIMEOUT,
+                    connect=HTTP_CONNECT_TIMEOUT,
+                    read=HTTP_READ_TIMEOUT,
+                    pool=HTTP_POOL_TIMEOUT,
+                ),
+                transport=TimedTransport(
+                    self._observe_wait,
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                    ),
+                    http2=_http2_available(),
+                ),
+                headers={"User-Agent": "hw2-anekdot-client"},
+            )
+        return self.client
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def _observe_wait(self, seconds: float) -> None:
+        self.acquires += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+        if seconds >= HTTP_POOL_WAIT_THRESHOLD:
+            self.waits += 1
+
+    async def get(self, url: str) -> httpx.Response:
+        client = self.start()
+
+        self.in_flight += 1
+        self.requests_total += 1
+
+        try:
+            return await client.get(url)
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        """
+        waits и wait_*_ms - замеренное время получения соединения (TimedTransport),
+        в него входит и задержка самого event loop. in_use/idle - примерные: это
+        соединения из внутренностей httpcore, а не запросы, и в HTTP/2 одно занятое
+        соединение везёт много запросов сразу, так что in_use там почти всегда 0 или 1.
+        """
+        in_use = 0
+        idle = 0
+
+        # httpx не даёт публичного API для пула, смотрим в httpcore аккуратно
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+
+        for conn in getattr(pool, "connections", []):
+            if conn.is_idle():
+                idle += 1
+            elif not conn.is_closed():
+                in_use += 1
+
+        return {
+            "http2": bool(self.client and _http2_available()),
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": HTTP_MAX_KEEPALIVE,
+            "in_use": in_use,
+            "idle": idle,
+            "in_flight": self.in_flight,
+            "waits": self.waits,
+            "wait_avg_ms": (self.wait_total / self.acquires * 1000) if self.acquires else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+            "requests_total": self.requests_total,
+        }
+
+
+upstream = UpstreamClient()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    upstream.start()
+    parse_stage.start()
+    search_index.load()
+    loop_lag.start()
+    random_pool.start()
+    disk_writer.start()
+    try:
+        yield
+    finally:
+        await random_pool.stop()
+        await revalidator.stop()
+        await loop_lag.stop()
+        await upstream.close()
+        await disk_writer.stop()
+        parse_stage.close()
+        best_cache.close()
+        search_index.close()
+
+
+app = FastAPI(title="HW2 – anekdot.ru proxy", lifespan=lifespan)
 
 
 class Joke(BaseModel):
@@ -27,72 +291,649 @@ class JokesResponse(BaseModel):
     jokes: List[Joke]
 
 
-async def fetch_html(url: str) -> str:
-    """Асинхронно забираем HTML с anekdot.ru."""
-    timeout = httpx.Timeout(10.0, read=10.0)
-
-    async with httpx.AsyncClient(
-        timeout=timeout,
-        headers={"User-Agent": "hw2-anekdot-client"}
-    ) as client:
-
-        resp = await client.get(url)
-        if resp.status_code != 200:
-            raise HTTPException(
-                status_code=502,
-                detail=f"anekdot.ru вернул статус {resp.status_code}",
+class FoundJoke(Joke):
+    date: Optional[str] = None  # день, в лучших которого был анекдот, если знаем
+    score: float
+
+
+class SearchResponse(BaseModel):
+    total: int
+    jokes: List[FoundJoke]
+
+
+class DiskWriter:
+    """
+    Одна фоновая задача пишет в SQLite за весь сервис: запись (с fsync на
+    коммите) уходит в отдельный поток и не держит event loop. Что накопилось
+    в очереди, пока шла прошлая запись, пишется пачкой с одним коммитом на
+    базу. Не запущен (warmup из консоли, тесты) - пишем сразу, как раньше.
+    """
+
+    def __init__(self, batch: int) -> None:
+        self.batch = batch
+        # очередь привязывается к event loop, поэтому создаётся в start(), а не при импорте
+        self.queue: "Optional[asyncio.Queue[Tuple[Callable[[], None], Callable[[], None]]]]" = None
+        self.task: Optional[asyncio.Task] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+        self.writes = 0
+        self.batches = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        if self.task is None:
+            self.queue = asyncio.Queue()
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+            self.task = asyncio.create_task(self._run())
+
+    def submit(self, write: Callable[[], None], commit: Callable[[], None]) -> None:
+        """write пишет без коммита, commit - коммит его базы (один на пачку)."""
+        if self.task is None:
+            self._apply([(write, commit)])
+            return
+
+        self.queue.put_nowait((write, commit))
+
+    def _apply(self, items: List[Tuple[Callable[[], None], Callable[[], None]]]) -> None:
+        commits: Dict[Callable[[], None], None] = {}
+
+        for write, commit in items:
+            try:
+                write()
+                commits[commit] = None
+            except sqlite3.Error as e:
+                print(f"Не записали в SQLite: {e}")
+                self.errors += 1
+
+        for commit in commits:
+            commit()
+
+        self.writes += len(items)
+        self.batches += 1
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            items = [await self.queue.get()]
+
+            while len(items) < self.batch and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+
+            try:
+                await loop.run_in_executor(self.executor, self._apply, items)
+            except Exception as e:
+                print(f"Фоновая запись упала: {e!r}")
+                self.errors += 1
+            finally:
+                for _ in items:
+                    self.queue.task_done()
+
+    async def stop(self) -> None:
+        """Дописываем очередь и останавливаемся (до закрытия баз)."""
+        if self.task is None:
+            return
+
+        await self.queue.join()
+        self.task.cancel()
+
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+        self.task = None
+        self.queue = None
+        self.executor.shutdown(wait=True)
+        self.executor = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "writes": self.writes,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
+
+
+disk_writer = DiskWriter(WRITE_BATCH)
+
+
+class BestCache:
+    """
+    Двухуровневый кэш распарсенных ответов /best по дате 'YYYY-MM-DD':
+    LRU в памяти + SQLite на диске. Прошедшие дни уже не меняются, поэтому
+    живут вечно, а сегодняшний (и будущие) - только today_ttl секунд.
+    Пишет disk_writer через одно соединение, а читаем через другое: база в
+    WAL, так что промах по памяти не ждёт в event loop чужого коммита.
+    """
+
+    def __init__(self, db_path: str, max_size: int, today_ttl: float) -> None:
+        self.db_path = db_path
+        self.max_size = max_size
+        self.today_ttl = today_ttl
+        self.memory: OrderedDict[str, Tuple[Optional[float], JokesResponse]] = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._read_db: Optional[sqlite3.Connection] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if not self.db_path:
+            return None
+
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS best ("
+                "date TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL)"
             )
-        return resp.text
+            self._db.commit()
 
+        return self._db
 
-def _set_en_locale() -> Optional[str]:
-    """ LC_TIME меняем на en_US, чтобы разобрать '01-January-2025'."""
+    def _reader(self) -> Optional[sqlite3.Connection]:
+        if self._conn() is None:
+            return None
 
-    try:
-        current = locale.setlocale(locale.LC_TIME)
+        if self._read_db is None:
+            self._read_db = sqlite3.connect(self.db_path, check_same_thread=False)
 
-    except locale.Error:
-        current = None
+        return self._read_db
 
-    try:
-        locale.setlocale(locale.LC_TIME, "en_US.UTF-8")
+    def _expires_at(self, key: str) -> Optional[float]:
+        if date_cls.fromisoformat(key) < datetime.now(SITE_TZ).date():
+            return None
+        return time.time() + self.today_ttl
+
+    def _remember(self, key: str, expires_at: Optional[float], value: JokesResponse) -> None:
+        self.memory[key] = (expires_at, value)
+        self.memory.move_to_end(key)
+
+        while len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[JokesResponse]:
+        now = time.time()
+
+        item = self.memory.get(key)
+        if item is not None:
+            expires_at, value = item
+
+            if expires_at is None or expires_at > now:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+        db = self._reader()
+        if db is not None:
+            row = db.execute(
+                "SELECT payload, expires_at FROM best WHERE date = ?", (key,)
+            ).fetchone()
+
+            if row is not None and (row[1] is None or row[1] > now):
+                value = JokesResponse.model_validate_json(row[0])
+                self._remember(key, row[1], value)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def get_stale(self, key: str, max_stale: float) -> Optional[JokesResponse]:
+        """Просроченная запись, если просрочена не больше чем на max_stale секунд."""
+        oldest = time.time() - max_stale
+
+        item = self.memory.get(key)
+        if item is not None and item[0] is not None and item[0] >= oldest:
+            return item[1]
+
+        db = self._reader()
+        if db is None:
+            return None
+
+        row = db.execute("SELECT payload, expires_at FROM best WHERE date = ?", (key,)).fetchone()
+        if row is not None and row[1] is not None and row[1] >= oldest:
+            return JokesResponse.model_validate_json(row[0])
+
+        return None
+
+    def put(self, key: str, value: JokesResponse) -> None:
+        """В память сразу, на диск - фоном через disk_writer (там же и сериализация)."""
+        expires_at = self._expires_at(key)
+        self._remember(key, expires_at, value)
+
+        db = self._conn()
+        if db is None:
+            return
+
+        def write() -> None:
+            db.execute(
+                "INSERT OR REPLACE INTO best (date, payload, expires_at) VALUES (?, ?, ?)",
+                (key, value.model_dump_json(), expires_at),
+            )
+
+        disk_writer.submit(write, self.commit)
+
+    def commit(self) -> None:
+        if self._db is not None:
+            self._db.commit()
+
+    def __contains__(self, key: str) -> bool:
+        item = self.memory.get(key)
+        if item is not None and (item[0] is None or item[0] > time.time()):
+            return True
+
+        db = self._reader()
+        if db is None:
+            return False
+
+        row = db.execute("SELECT expires_at FROM best WHERE date = ?", (key,)).fetchone()
+        return row is not None and (row[0] is None or row[0] > time.time())
+
+    def close(self) -> None:
+        if self._read_db is not None:
+            self._read_db.close()
+            self._read_db = None
+
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        return {
+            "memory_size": len(self.memory),
+            "memory_max_size": self.max_size,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+
+best_cache = BestCache(BEST_CACHE_DB, BEST_CACHE_SIZE, BEST_TODAY_TTL)
+
+
+class CircuitBreaker:
+    """
+    Если anekdot.ru начал массово падать или тормозить, не держим каждый запрос
+    до таймаута: размыкаемся на open_seconds и сразу отвечаем ошибкой (или
+    устаревшим ответом). Потом пропускаем несколько пробных запросов
+    (half_open): удачный - замыкаемся обратно, неудачный - снова открыты.
+    """
+
+    def __init__(
+        self,
+        window: int,
+        min_calls: int,
+        failure_rate: float,
+        open_seconds: float,
+        probes: int,
+    ) -> None:
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.probes = probes
+
+        self.state = "closed"
+        self.results: Deque[bool] = deque(maxlen=window)
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+
+            self.state = "half_open"
+            self.probes_in_flight = 0
+
+        if self.state == "half_open":
+            if self.probes_in_flight >= self.probes:
+                self.rejected += 1
+                return False
+
+            self.probes_in_flight += 1
+
+        return True
+
+    def record(self, ok: Optional[bool], probe: bool) -> None:
+        """ok=None - запрос отменили, результат неизвестен, просто освобождаем пробу."""
+        if probe:
+            self.probes_in_flight -= 1
+
+            if ok is True:
+                self.state = "closed"
+                self.results.clear()
+            elif ok is False:
+                self._open()
+
+            return
+
+        if ok is None or self.state != "closed":
+            return
+
+        self.results.append(ok)
+
+        if len(self.results) >= self.min_calls and self.current_failure_rate() >= self.failure_rate:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
 
-    except locale.Error:
-        pass
+    def current_failure_rate(self) -> float:
+        if not self.results:
+            return 0.0
+        return self.results.count(False) / len(self.results)
 
-    return current
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failure_rate": round(self.current_failure_rate(), 3),
+            "window_calls": len(self.results),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
 
 
-def _restore_locale(old: Optional[str]) -> None:
+upstream_breaker = CircuitBreaker(
+    BREAKER_WINDOW,
+    BREAKER_MIN_CALLS,
+    BREAKER_FAILURE_RATE,
+    BREAKER_OPEN_SECONDS,
+    BREAKER_PROBES,
+)
 
-    if not old:
-        return
+
+async def fetch_html(url: str) -> str:
+    """Асинхронно забираем HTML с anekdot.ru через общий клиент."""
+    if not upstream_breaker.allow():
+        raise HTTPException(
+            status_code=503,
+            detail="anekdot.ru сейчас недоступен, попробуйте позже",
+        )
+
+    probe = upstream_breaker.state == "half_open"
 
     try:
+        resp = await upstream.get(url)
 
-        locale.setlocale(locale.LC_TIME, old)
+    except httpx.HTTPError as e:
+        upstream_breaker.record(False, probe)
+        raise HTTPException(
+            status_code=502,
+            detail=f"anekdot.ru не ответил: {type(e).__name__}",
+        ) from e
 
-    except locale.Error:
-        pass
+    except BaseException:
+        # отменили (клиент ушёл) - о здоровье сайта это ничего не говорит
+        upstream_breaker.record(None, probe)
+        raise
 
+    # 404 на несуществующий день - сайт жив, падением это не считаем
+    upstream_breaker.record(resp.status_code < 500, probe)
 
-def parse_input_date(date_str: str) -> str:
-    old_locale = _set_en_locale()
+    if resp.status_code != 200:
+        raise HTTPException(
+            status_code=502,
+            detail=f"anekdot.ru вернул статус {resp.status_code}",
+        )
+    return resp.text
+
+
+class SingleFlight:
+    """
+    Склеиваем одновременные одинаковые запросы: первый вызов по ключу
+    запускает работу отдельной задачей, остальные ждут тот же результат.
+    Ошибка долетает до всех ждущих. Если клиент отвалился (его отменили),
+    работа продолжается для остальных и отменяется только когда ждать
+    её больше некому.
+    """
+
+    def __init__(self) -> None:
+        self.calls: Dict[Hashable, asyncio.Task] = {}
+        self.waiters: Dict[Hashable, int] = {}
+        self.started = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.calls.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self.calls[key] = task
+            self.waiters[key] = 0
+            self.started += 1
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+
+        else:
+            self.shared += 1
+
+        self.waiters[key] += 1
+
+        try:
+            return await asyncio.shield(task)
+
+        finally:
+            if self.calls.get(key) is task:
+                self.waiters[key] -= 1
+
+                if self.waiters[key] == 0 and not task.done():
+                    task.cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self.calls.get(key) is task:
+            del self.calls[key]
+            del self.waiters[key]
+
+        # чтобы asyncio не ругался на "exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.calls),
+            "started": self.started,
+            "shared": self.shared,
+        }
+
+
+inflight = SingleFlight()
+
+
+class ParseStage:
+    """
+    Разбор HTML вынесен из event loop в пул процессов (или потоков), чтобы
+    одна большая страница не тормозила все остальные запросы. Очередь
+    ограничена: больше max_pending разборов в пул одновременно не отдаём.
+    """
+
+    def __init__(self, kind: str, workers: int, max_pending: int) -> None:
+        if kind not in ("process", "thread", "inline"):
+            raise ValueError(f"Неизвестный тип пула для парсинга: {kind!r}")
+
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor: Optional[Executor] = None
+        # семафор привязывается к event loop - создаём в start(), а не при импорте
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self.running = 0
+        self.waiting = 0
+        self.done = 0
+
+    def start(self) -> Optional[Executor]:
+        if self.executor is None and self.kind != "inline":
+            if self.kind == "process":
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers)
+
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        return self.executor
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self._slots = None
+
+    async def run(self, parse: Callable[[str], List[Joke]], html: str) -> List[Joke]:
+        if self.kind == "inline":
+            self.done += 1
+            return parse(html)
+
+        executor = self.start()
+        loop = asyncio.get_running_loop()
+
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        try:
+            return await loop.run_in_executor(executor, parse, html)
+        finally:
+            self.running -= 1
+            self.done += 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "running": self.running,
+            "waiting": self.waiting,
+            "done": self.done,
+        }
+
+
+parse_stage = ParseStage(PARSE_EXECUTOR, PARSE_WORKERS, PARSE_QUEUE)
+
+
+class LoopLagMonitor:
+    """
+    Раз в interval секунд засыпаем и смотрим, насколько позже проснулись.
+    Это опоздание и есть задержка event loop: если кто-то его блокирует,
+    оно растёт.
+    """
+
+    def __init__(self, interval: float, window: int = 600) -> None:
+        self.interval = interval
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - t0 - self.interval)
+
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+
+    def stats(self) -> dict:
+        ordered = sorted(self.samples)
+
+        def pct(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": len(ordered),
+            "last_ms": (self.samples[-1] * 1000) if self.samples else 0.0,
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+            "max_ms": self.max_lag * 1000,
+        }
+
+
+loop_lag = LoopLagMonitor(LOOP_LAG_INTERVAL)
+
+
+_MONTHS = {
+    name.lower(): number
+    for number, name in enumerate(
+        [
+            "January", "February", "March", "April", "May", "June",
+            "July", "August", "September", "October", "November", "December",
+        ],
+        start=1,
+    )
+}
+
+# то же, что принимал strptime("%d-%B-%Y"): день 1-2 цифры, полное имя месяца, год 4 цифры
+_DATE_RE = re.compile(r"([0-9]{1,2})-([A-Za-z]+)-([0-9]{4})")
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_cached(date_str: str) -> Optional[str]:
+    """'01-January-2025' -> '2025-01-01' без locale; None, если дата кривая."""
+    m = _DATE_RE.fullmatch(date_str)
+    if not m:
+        return None
+
+    month = _MONTHS.get(m.group(2).lower())
+    if month is None:
+        return None
 
     try:
-        dt = datetime.strptime(date_str, "%d-%B-%Y")
+        dt = date_cls(int(m.group(3)), month, int(m.group(1)))
+    except ValueError:
+        return None
+
+    return dt.isoformat()
+
 
-    except ValueError as e:
+def parse_input_date(date_str: str) -> str:
+    # раньше переключали LC_TIME на en_US ради strptime - это глобальное состояние
+    # процесса, гонки между потоками и падение там, где нет en_US.UTF-8
+    parsed = _parse_date_cached(date_str)
+
+    if parsed is None:
 
         raise HTTPException(
             status_code=400,
             detail="Неверный формат даты - ожидаемый формате '01-January-2025'",
-        ) from e
-
-    finally:
-        _restore_locale(old_locale)
+        )
 
-    return dt.strftime("%Y-%m-%d")
+    return parsed
 
 
 
@@ -134,7 +975,124 @@ def _guess_author_name_from_joke(joke: Joke) -> Optional[str]:
     return first
 
 
-def _attach_author_profiles(jokes: List[Joke], soup: BeautifulSoup) -> None:
+AuthorIndex = Dict[str, Optional[str]]
+
+
+def _build_author_index(soup: BeautifulSoup) -> AuthorIndex:
+    """
+    Один проход по всем <a>: текст ссылки -> href. Как и soup.find,
+    берём первую ссылку с таким текстом, даже если у неё нет href.
+    """
+    index: AuthorIndex = {}
+
+    for a in soup.find_all("a"):
+        s = a.string
+
+        if not s:
+            continue
+
+        index.setdefault(s.strip(), a.get("href"))
+
+    return index
+
+
+def _bs4_backend(html: str) -> Tuple[str, Callable[[], AuthorIndex]]:
+    soup = BeautifulSoup(html, "lxml")
+    return soup.get_text("\n", strip=True), lambda: _build_author_index(soup)
+
+
+# содержимое этих тегов BeautifulSoup не отдаёт в get_text
+_LXML_SKIP_TEXT = {"script", "style", "template"}
+
+
+def _lxml_collect_text(el: etree._Element, parts: List[str]) -> None:
+    """Тексты в том же порядке и с той же чисткой, что soup.get_text("\n", strip=True)."""
+    # у комментариев и <?...?> tag не строка, их текст не нужен, но хвост нужен
+    if isinstance(el.tag, str) and el.tag not in _LXML_SKIP_TEXT:
+        text = (el.text or "").strip()
+        if text:
+            parts.append(text)
+
+        for child in el:
+            _lxml_collect_text(child, parts)
+
+    tail = (el.tail or "").strip()
+    if tail:
+        parts.append(tail)
+
+
+def _lxml_string(el: etree._Element) -> Optional[str]:
+    """Аналог bs4 Tag.string: единственный текстовый ребёнок, в том числе вложенный."""
+    children = list(el)
+
+    if not children:
+        return el.text
+
+    if len(children) > 1 or el.text or children[0].tail:
+        return None
+
+    child = children[0]
+
+    if not isinstance(child.tag, str):
+        return child.text
+
+    return _lxml_string(child)
+
+
+def _build_author_index_lxml(root: etree._Element) -> AuthorIndex:
+    index: AuthorIndex = {}
+
+    for a in root.iter("a"):
+        s = _lxml_string(a)
+
+        if not s:
+            continue
+
+        index.setdefault(s.strip(), a.get("href"))
+
+    return index
+
+
+# кодировку задаём явно: из str lxml не разбирает <?xml encoding=...?>, а из
+# bytes без неё поверил бы объявлению в самой странице
+_LXML_PARSER = lxml_html.HTMLParser(encoding="utf-8")
+
+
+def _lxml_backend(html: str) -> Tuple[str, Callable[[], AuthorIndex]]:
+    try:
+        root = lxml_html.document_fromstring(html.encode("utf-8"), parser=_LXML_PARSER)
+
+    except etree.ParserError:
+        # пустая страница, одни пробелы или комментарии - "Document is empty"
+        return "", dict
+
+    parts: List[str] = []
+    _lxml_collect_text(root, parts)
+
+    return "\n".join(parts), lambda: _build_author_index_lxml(root)
+
+
+HTML_BACKENDS: Dict[str, Callable[[str], Tuple[str, Callable[[], AuthorIndex]]]] = {
+    "bs4": _bs4_backend,
+    "lxml": _lxml_backend,
+}
+
+
+def _load_page(html: str, backend: Optional[str]) -> Tuple[str, Callable[[], AuthorIndex]]:
+    """Текст страницы построчно и ленивый индекс ссылок авторов."""
+    name = backend or HTML_BACKEND
+
+    try:
+        load = HTML_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Неизвестный парсер HTML: {name!r}") from None
+
+    return load(html)
+
+
+def _attach_author_profiles(jokes: List[Joke], get_index: Callable[[], AuthorIndex]) -> None:
+    index: Optional[AuthorIndex] = None
+
     for joke in jokes:
         if joke.autor_profile:  
             continue
@@ -144,13 +1102,11 @@ def _attach_author_profiles(jokes: List[Joke], soup: BeautifulSoup) -> None:
         if not name:
             continue
 
-        # Ищем ссылку вида <a>ИмяАвтора</a>
-        a = soup.find("a", string=lambda s: s and s.strip() == name)
+        # Ищем ссылку вида <a>ИмяАвтора</a>; индекс строим только если он понадобился
+        if index is None:
+            index = get_index()
 
-        if not a:
-            continue
-
-        href = a.get("href")
+        href = index.get(name)
 
         if not href:
             continue
@@ -218,9 +1174,8 @@ def _parse_jokes_by_ratings(text: str) -> List[Joke]:
     return jokes
 
 
-def parse_best_html(html: str) -> List[Joke]:
-    soup = BeautifulSoup(html, "lxml")
-    full = soup.get_text("\n", strip=True)
+def parse_best_html(html: str, backend: Optional[str] = None) -> List[Joke]:
+    full, get_index = _load_page(html, backend)
 
     marker1 = "Самые смешные анекдоты за день!"
     idx = full.find(marker1)
@@ -236,15 +1191,14 @@ def parse_best_html(html: str) -> List[Joke]:
 
     jokes = _parse_jokes_by_ratings(full)
 
-    _attach_author_profiles(jokes, soup)
+    _attach_author_profiles(jokes, get_index)
 
     return jokes
 
 
-def parse_random_html(html: str) -> List[Joke]:
+def parse_random_html(html: str, backend: Optional[str] = None) -> List[Joke]:
 
-    soup = BeautifulSoup(html, "lxml")
-    full = soup.get_text("\n", strip=True)
+    full, get_index = _load_page(html, backend)
 
     # отсечём шапку
     marker = "Случайные анекдоты"
@@ -261,34 +1215,492 @@ def parse_random_html(html: str) -> List[Joke]:
 
     jokes = _parse_jokes_by_ratings(full)
 
-    _attach_author_profiles(jokes, soup)
+    _attach_author_profiles(jokes, get_index)
 
     return jokes
 
 
+async def fetch_and_parse(url: str, parse: Callable[[str], List[Joke]]) -> List[Joke]:
+    """
+    Скачиваем и парсим страницу; одновременные вызовы с тем же url
+    и тем же парсером делят одну загрузку и один разбор.
+    """
+
+    async def work() -> List[Joke]:
+        html = await fetch_html(url)
+        return await parse_stage.run(parse, html)
+
+    return await inflight.do((url, parse), work)
+
+
+class RandomPool:
+    """
+    Запас уже распарсенных случайных анекдотов для /random.
+    Фоновая задача докачивает страницу, когда запас падает ниже low,
+    и останавливается на high. Недавно выданные тексты запоминаем,
+    чтобы не отдавать одно и то же.
+    """
+
+    def __init__(self, low: int, high: int, recent_size: int) -> None:
+        self.low = low
+        self.high = high
+        self.recent_size = recent_size
+
+        self.jokes: Deque[Joke] = deque()
+        self.texts: set[str] = set()  # тексты, которые сейчас лежат в запасе
+        self.recent: Deque[str] = deque()
+        self.recent_set: set[str] = set()
+
+        self.last_page: List[Joke] = []
+        self.last_page_at = 0.0
+
+        # Event привязывается к event loop - создаём в start(), а не при импорте
+        self._need: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.upstream_fetches = 0
+        self.served = 0
+        self.duplicates = 0
+        self.errors = 0
+
+    def _mark_served(self, text: str) -> None:
+        if self.recent_size <= 0:
+            return
+
+        if len(self.recent) >= self.recent_size:
+            self.recent_set.discard(self.recent.popleft())
+
+        self.recent.append(text)
+        self.recent_set.add(text)
+
+    async def refill_once(self) -> int:
+        """
+        Одна страница с anekdot.ru в запас; вернёт сколько новых добавилось.
+        Одновременные вызовы (take и фоновая задача) делят одну докачку, так что
+        страница считается и индексируется один раз.
+        """
+        return await inflight.do("random_pool.refill", self._refill)
+
+    async def _refill(self) -> int:
+        jokes = await fetch_and_parse(RANDOM_URL, parse_random_html)
+        self.upstream_fetches += 1
+        self.last_page = jokes
+        self.last_page_at = time.monotonic()
+        index_jokes(jokes, None)
+
+        added = 0
+        for joke in jokes:
+            if len(self.jokes) >= self.high:
+                break
+
+            if joke.text in self.texts or joke.text in self.recent_set:
+                self.duplicates += 1
+                continue
+
+            self.jokes.append(joke)
+            self.texts.add(joke.text)
+            added += 1
+
+        return added
+
+    async def take(self, count: int) -> List[Joke]:
+        error: Optional[HTTPException] = None
+
+        # если запаса не хватает (холодный старт или большой count) - докачиваем сами
+        while len(self.jokes) < count:
+            try:
+                if not await self.refill_once():
+                    break
+            except HTTPException as e:
+                # сайт лежит - отдадим что есть в запасе
+                error = e
+                break
+
+        taken: List[Joke] = []
+        while self.jokes and len(taken) < count:
+            joke = self.jokes.popleft()
+            self.texts.discard(joke.text)
+            self._mark_served(joke.text)
+            taken.append(joke)
+
+        # всё свежее уже выдали (или сайт не отвечает) - лучше повтор недавней
+        # страницы, чем ошибка, но не слишком старой
+        if not taken and time.monotonic() - self.last_page_at <= RANDOM_MAX_STALE:
+            taken = self.last_page[:count]
+
+            if error is not None and taken:
+                revalidator.count_stale("random")
+
+        if not taken and error is not None:
+            raise error
+
+        self.served += len(taken)
+
+        if self._need is not None and len(self.jokes) < self.low:
+            self._need.set()
+
+        return taken
+
+    def _retry_delay(self, failures: int) -> float:
+        delay = min(RANDOM_RETRY_MAX, RANDOM_RETRY_MIN * 2 ** (failures - 1))
+
+        # пока предохранитель открыт, любой повтор - мгновенный 503
+        if upstream_breaker.state == "open":
+            delay = max(delay, upstream_breaker.opened_at + upstream_breaker.open_seconds - time.monotonic())
+
+        return delay
+
+    async def _run(self) -> None:
+        failures = 0
+
+        while True:
+            await self._need.wait()
+            self._need.clear()
+
+            while len(self.jokes) < self.high:
+                try:
+                    added = await self.refill_once()
+
+                except asyncio.CancelledError:
+                    raise
+
+                except Exception as e:
+                    self.errors += 1
+                    failures += 1
+                    delay = self._retry_delay(failures)
+                    print(f"Не получилось пополнить запас /random: {e!r}, повтор через {delay:.0f} с")
+                    await asyncio.sleep(delay)
+                    continue
+
+                failures = 0
+
+                # страница целиком из повторов - ждём следующего take
+                if not added:
+                    break
+
+    def start(self) -> None:
+        if self._task is None:
+            self._need = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            self._need.set()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+        self._need = None
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.jokes),
+            "low": self.low,
+            "high": self.high,
+            "served": self.served,
+            "upstream_fetches": self.upstream_fetches,
+            "duplicates_skipped": self.duplicates,
+            "errors": self.errors,
+        }
+
+
+search_index = SearchIndex(SEARCH_DB)
+
+
+def index_jokes(jokes: List[Joke], date_for_url: Optional[str]) -> None:
+    """Всё, что распарсили, складываем в поисковый индекс (фоном, через disk_writer)."""
+    rows = [(j.text, j.rating, date_for_url, j.autor_profile) for j in jokes]
+
+    disk_writer.submit(lambda: search_index.add(rows, commit=False), search_index.commit)
+
+
+random_pool = RandomPool(RANDOM_POOL_LOW, RANDOM_POOL_HIGH, RANDOM_RECENT_SIZE)
+
+
+def _sort_by_rating(jokes: List[Joke]) -> List[Joke]:
+    # сортируем по rating по убыванию, без рейтинга - в конец
+    return sorted(
+        jokes,
+        key=lambda j: (j.rating is None, -(j.rating or 0)),
+    )
+
+
+def _dump_json(model: BaseModel) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(model.model_dump())
+    return model.model_dump_json().encode()
+
+
+def json_response(model: BaseModel) -> Response:
+    """
+    Готовый JSON без повторной валидации и jsonable_encoder внутри FastAPI:
+    модель и так уже проверена, а orjson сериализует в разы быстрее.
+    """
+    return Response(content=_dump_json(model), media_type="application/json")
+
+
+def ndjson_response(jokes: AsyncIterable[Joke]) -> StreamingResponse:
+    """По анекдоту на строку, отправляем по мере готовности."""
+
+    async def lines() -> AsyncIterator[bytes]:
+        async for joke in jokes:
+            yield _dump_json(joke) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def _iter_jokes(jokes: List[Joke]) -> AsyncIterator[Joke]:
+    for joke in jokes:
+        yield joke
+
+
+# format=json - обычный ответ JokesResponse, format=ndjson - поток по анекдоту на строку
+FORMAT_QUERY = Query("json", pattern="^(json|ndjson)$", description="json или ndjson")
+
+
+class Revalidator:
+    """
+    stale-while-revalidate: отдаём последний хороший ответ сразу, а свежий
+    качаем в фоне (по одному на ключ). Заодно считаем, сколько раз
+    пришлось отдать устаревшее.
+    """
+
+    def __init__(self) -> None:
+        self.tasks: Dict[Hashable, asyncio.Task] = {}
+        self.stale_served: Dict[str, int] = {}
+        self.refreshed = 0
+        self.failed = 0
+
+    def count_stale(self, endpoint: str) -> None:
+        self.stale_served[endpoint] = self.stale_served.get(endpoint, 0) + 1
+
+    def serve_stale(self, endpoint: str, key: Hashable, refresh: Callable[[], Awaitable[Any]]) -> None:
+        self.count_stale(endpoint)
+
+        if key in self.tasks:
+            return
+
+        task = asyncio.create_task(refresh())
+        self.tasks[key] = task
+        task.add_done_callback(lambda t, k=key: self._done(k, t))
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        self.tasks.pop(key, None)
+
+        if task.cancelled():
+            return
+
+        if task.exception() is None:
+            self.refreshed += 1
+        else:
+            self.failed += 1
+
+    async def stop(self) -> None:
+        for task in list(self.tasks.values()):
+            task.cancel()
+
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "stale_served": dict(self.stale_served),
+            "refreshing": len(self.tasks),
+            "refreshed": self.refreshed,
+            "refresh_failed": self.failed,
+        }
+
+
+revalidator = Revalidator()
+
+
+async def load_best(date_for_url: str) -> JokesResponse:
+    """
+    Лучшие за день 'YYYY-MM-DD': сначала из кэша; если запись за сегодня
+    протухла недавно - отдаём её и обновляем в фоне; иначе качаем и парсим.
+    """
+    cached = best_cache.get(date_for_url)
+    if cached is not None:
+        return cached
+
+    stale = best_cache.get_stale(date_for_url, BEST_MAX_STALE)
+    if stale is not None:
+        revalidator.serve_stale("best", ("best", date_for_url), lambda: _fetch_best(date_for_url))
+        return stale
+
+    return await _fetch_best(date_for_url)
+
+
+async def _fetch_best(date_for_url: str) -> JokesResponse:
+    url = BEST_DAY_URL.format(date=date_for_url)
+    jokes = await fetch_and_parse(url, parse_best_html)
+
+    if not jokes:
+
+        raise HTTPException(status_code=404, detail="Анекдоты для этой даты не найдены")
+
+    response = JokesResponse(jokes=_sort_by_rating(jokes))
+    best_cache.put(date_for_url, response)
+    index_jokes(jokes, date_for_url)
+
+    return response
+
+
 @app.get("/best", response_model=JokesResponse)
 async def best(
     date: str = Query(
         ...,
         description="Дата в формате '01-January-2025' (день-месяц-год на американском)",
-    )
+    ),
+    format: str = FORMAT_QUERY,
 ):
     date_for_url = parse_input_date(date)
-    url = BEST_DAY_URL.format(date=date_for_url)
-    html = await fetch_html(url)
-    jokes = parse_best_html(html)
+    response = await load_best(date_for_url)
+
+    if format == "ndjson":
+        return ndjson_response(_iter_jokes(response.jokes))
+
+    return json_response(response)
+
+
+class TopJokes:
+    """
+    Держим только top лучших анекдотов в min-куче, а не копим и сортируем всё.
+    Порядок тот же, что в _sort_by_rating: без рейтинга - в самом конце,
+    при равном рейтинге выигрывает более ранний день, а в дне - кто выше на
+    странице. Дни приходят в порядке готовности, поэтому от порядка вызовов
+    push результат не зависит.
+    """
+
+    def __init__(self, top: int) -> None:
+        self.top = top
+        self.heap: List[Tuple[bool, int, int, int, Joke]] = []
+
+    def push(self, joke: Joke, day: int, position: int) -> None:
+        """day - номер дня в диапазоне, position - место анекдота на странице дня."""
+        item = (joke.rating is not None, joke.rating or 0, -day, -position, joke)
+
+        if len(self.heap) < self.top:
+            heapq.heappush(self.heap, item)
+
+        elif item[:4] > self.heap[0][:4]:
+            heapq.heapreplace(self.heap, item)
+
+    def result(self) -> List[Joke]:
+        return [item[4] for item in sorted(self.heap, key=lambda i: i[:4], reverse=True)]
+
+
+async def iter_best_range(date_from: str, date_to: str) -> AsyncIterator[Tuple[int, List[Joke]]]:
+    """
+    Анекдоты за дни с date_from по date_to ('YYYY-MM-DD', включительно),
+    по дню за раз в порядке готовности: (номер дня от date_from, анекдоты).
+    Дни качаем параллельно, но не больше RANGE_CONCURRENCY за раз; дни,
+    которые не удалось получить, пропускаем.
+    """
+    first = date_cls.fromisoformat(date_from)
+    last = date_cls.fromisoformat(date_to)
+
+    days = [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+    sem = asyncio.Semaphore(RANGE_CONCURRENCY)
+
+    async def load_day(index: int, day: str) -> Tuple[int, List[Joke]]:
+        async with sem:
+            try:
+                return index, (await load_best(day)).jokes
+            except (HTTPException, httpx.HTTPError):
+                return index, []
+
+    tasks = [asyncio.create_task(load_day(index, day)) for index, day in enumerate(days)]
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, jokes = await next_done
+            if jokes:
+                yield index, jokes
+
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def load_best_range(date_from: str, date_to: str, top: int) -> List[Joke]:
+    """Лучшие top анекдотов за диапазон дней."""
+    best_jokes = TopJokes(top)
+
+    async for day, jokes in iter_best_range(date_from, date_to):
+        for position, joke in enumerate(jokes):
+            best_jokes.push(joke, day, position)
+
+    return best_jokes.result()
+
+
+async def _stream_best_range(first_day: List[Joke], days: AsyncIterator[Tuple[int, List[Joke]]]) -> AsyncIterator[Joke]:
+    try:
+        for joke in first_day:
+            yield joke
+
+        async for _, jokes in days:
+            for joke in jokes:
+                yield joke
+
+    finally:
+        # клиент ушёл посреди выгрузки - не докачиваем оставшиеся дни
+        await days.aclose()
+
+
+@app.get("/best/range", response_model=JokesResponse)
+async def best_range(
+    date_from: str = Query(..., alias="from", description="Первый день, например '01-January-2025'"),
+    date_to: str = Query(..., alias="to", description="Последний день (включительно)"),
+    top: Optional[int] = Query(
+        None,
+        ge=1,
+        le=1000,
+        description="Сколько лучших анекдотов вернуть (по умолчанию 10; в ndjson без top - все подряд)",
+    ),
+    format: str = FORMAT_QUERY,
+):
+    first = parse_input_date(date_from)
+    last = parse_input_date(date_to)
+
+    if first > last:
+        raise HTTPException(status_code=400, detail="Дата 'from' позже даты 'to'")
+
+    days = (date_cls.fromisoformat(last) - date_cls.fromisoformat(first)).days + 1
+    if days > RANGE_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Слишком длинный диапазон: {days} дней, максимум {RANGE_MAX_DAYS}",
+        )
+
+    # выгрузка всего диапазона: отдаём дни по мере загрузки, ничего не копим.
+    # Первый день ждём до ответа, чтобы, как и в JSON, ответить 404, если не загрузилось ничего
+    if format == "ndjson" and top is None:
+        days = iter_best_range(first, last)
+
+        try:
+            _, first_day = await days.__anext__()
+
+        except StopAsyncIteration:
+            raise HTTPException(status_code=404, detail="Анекдоты для этих дат не найдены")
+
+        return ndjson_response(_stream_best_range(first_day, days))
+
+    jokes = await load_best_range(first, last, top or 10)
 
     if not jokes:
 
-        raise HTTPException(status_code=404, detail="Анекдоты для этой даты не найдены")
+        raise HTTPException(status_code=404, detail="Анекдоты для этих дат не найдены")
 
-    # сортируем по rating по убыванию
-    jokes_sorted = sorted(
-        jokes,
-        key=lambda j: (j.rating is None, -(j.rating or 0)),
-    )
+    if format == "ndjson":
+        return ndjson_response(_iter_jokes(jokes))
 
-    return JokesResponse(jokes=jokes_sorted)
+    return json_response(JokesResponse(jokes=jokes))
 
 
 @app.get("/random", response_model=JokesResponse)
@@ -299,10 +1711,10 @@ async def random_jokes(
         ge=1,
         le=50,
         description="",
-    )
+    ),
+    format: str = FORMAT_QUERY,
 ):
-    html = await fetch_html(RANDOM_URL)
-    jokes = parse_random_html(html)
+    jokes = await random_pool.take(count)
 
     if not jokes:
 
@@ -311,12 +1723,122 @@ async def random_jokes(
             detail="Не получилось распарсить anekdot.ru"
         )
 
-    jokes_sorted = sorted(
-        jokes,
-        key=lambda j: (j.rating is None, -(j.rating or 0)),
-    )
+    jokes = _sort_by_rating(jokes)
+
+    if format == "ndjson":
+        return ndjson_response(_iter_jokes(jokes))
+
+    return json_response(JokesResponse(jokes=jokes))
+
+
+@app.get("/search", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, description="Слова для поиска"),
+    limit: int = Query(20, ge=1, le=200),
+):
+    # FTS5 на частом слове - это сотни мс, в event loop их держать нельзя
+    loop = asyncio.get_running_loop()
+    total, hits = await loop.run_in_executor(None, search_index.search, q, limit)
+    return json_response(SearchResponse(total=total, jokes=hits))
+
+
+@app.get("/stats/pool")
+async def pool_stats():
+    """Пул соединений к anekdot.ru: ожидание соединения замерено, занятость - примерная (особенно в HTTP/2)."""
+    return upstream.stats()
+
+
+@app.get("/stats/cache")
+async def cache_stats():
+    """Попадания и промахи кэша /best."""
+    return best_cache.stats()
+
+
+@app.get("/stats/inflight")
+async def inflight_stats():
+    """Сколько загрузок сейчас идёт и сколько запросов к ним присоединилось."""
+    return inflight.stats()
+
+
+@app.get("/stats/random")
+async def random_pool_stats():
+    """Состояние запаса случайных анекдотов."""
+    return random_pool.stats()
+
+
+@app.get("/stats/upstream")
+async def upstream_stats():
+    """Предохранитель на anekdot.ru и отдачи устаревших ответов."""
+    return {"breaker": upstream_breaker.stats(), "stale": revalidator.stats()}
+
+
+@app.get("/stats/search")
+async def search_stats():
+    """Размер поискового индекса."""
+    return await asyncio.get_running_loop().run_in_executor(None, search_index.stats)
+
+
+@app.get("/stats/writer")
+async def writer_stats():
+    """Фоновая запись в SQLite: сколько ждёт, сколько записано и сколькими коммитами."""
+    return disk_writer.stats()
+
+
+@app.get("/stats/parse")
+async def parse_stats():
+    """Очередь разбора HTML и задержка event loop."""
+    return {"parse": parse_stage.stats(), "loop_lag": loop_lag.stats()}
+
+
+async def warmup(date_from: str, date_to: str) -> None:
+    """Заранее складываем в кэш все дни из диапазона (включительно)."""
+    day = date_cls.fromisoformat(parse_input_date(date_from))
+    last = date_cls.fromisoformat(parse_input_date(date_to))
+
+    loaded = 0
+    skipped = 0
+    failed = 0
+
+    try:
+        while day <= last:
+            key = day.isoformat()
+
+            if key in best_cache:
+                skipped += 1
+
+            else:
+                try:
+                    await load_best(key)
+                    loaded += 1
+                except (HTTPException, httpx.HTTPError) as e:
+                    print(f"{key}: не получилось ({e})")
+                    failed += 1
+
+            day += timedelta(days=1)
+
+    finally:
+        await upstream.close()
+        await disk_writer.stop()
+        parse_stage.close()
+        best_cache.close()
+        search_index.close()
+
+    print(f"Загружено: {loaded}, уже было в кэше: {skipped}, ошибок: {failed}")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Прогрев кэша /best")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    warm = sub.add_parser("warmup", help="загрузить в кэш диапазон дат")
+    warm.add_argument("date_from", help="первая дата, например 01-January-2025")
+    warm.add_argument("date_to", help="последняя дата, например 31-January-2025")
+
+    args = parser.parse_args()
 
-    return JokesResponse(jokes=jokes_sorted[:count])
+    if args.command == "warmup":
+        asyncio.run(warmup(args.date_from, args.date_to))
 
 
 #Сделал два эндпоинта: /best берёт лучшие анекдоты за конкретный день, дату даю в формате 01-January-2025, 
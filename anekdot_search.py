@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Полнотекстовый поиск по всем анекдотам, которые когда-либо приходили с anekdot.ru.
+# Обратный индекс держит SQLite FTS5: он пополняется по одной странице, лежит на диске
+# и не требует пересборки при старте. Рейтинг и дата хранятся рядом с текстом.
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _match_query(query: str) -> str:
+    """Слова запроса в кавычках через пробел: FTS5 ищет все сразу, спецсинтаксис не срабатывает."""
+    return " ".join(f'"{word}"' for word in _WORD_RE.findall(query))
+
+
+class SearchIndex:
+    """
+    Таблица jokes хранит текст (уникальный), рейтинг, дату и автора,
+    а jokes_fts - индекс по тексту поверх неё (external content),
+    синхронизируется триггерами. db_path="" - всё только в памяти.
+
+    Пишет одно соединение, а search()/stats() читают через свои, по одному
+    на поток: база в WAL, так что чтение не ждёт чужого коммита с fsync.
+    В памяти (db_path="") соединение одно на всё - другое увидело бы пустую базу.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._db: Optional[sqlite3.Connection] = None
+        self._readers: Dict[int, sqlite3.Connection] = {}  # поток -> соединение для чтения
+        self._readers_lock = threading.Lock()
+        self.available = True
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self._db is not None or not self.available:
+            return self._db
+
+        db = sqlite3.connect(self.db_path or ":memory:", check_same_thread=False)
+
+        try:
+            if self.db_path:
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA synchronous=NORMAL")
+
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jokes (
+                    id INTEGER PRIMARY KEY,
+                    text TEXT NOT NULL UNIQUE,
+                    rating INTEGER,
+                    date TEXT,
+                    autor_profile TEXT
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS jokes_fts USING fts5(
+                    text, content='jokes', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                );
+                CREATE TRIGGER IF NOT EXISTS jokes_ai AFTER INSERT ON jokes BEGIN
+                    INSERT INTO jokes_fts (rowid, text) VALUES (new.id, new.text);
+                END;
+                """
+            )
+
+        except sqlite3.OperationalError as e:
+            # sqlite собран без FTS5 - поиск просто выключаем
+            print(f"Поиск недоступен: {e}")
+            db.close()
+            self.available = False
+            return None
+
+        self._db = db
+        return db
+
+    def _reader(self) -> Optional[sqlite3.Connection]:
+        db = self._conn()
+
+        if db is None or not self.db_path:
+            return db
+
+        thread = threading.get_ident()
+
+        with self._readers_lock:
+            reader = self._readers.get(thread)
+
+            if reader is None:
+                reader = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._readers[thread] = reader
+
+        return reader
+
+    def load(self) -> None:
+        """Открываем базу заранее, чтобы первый запрос не ждал."""
+        self._conn()
+
+    def add(self, jokes: Iterable[Tuple[str, Optional[int], Optional[str], Optional[str]]], commit: bool = True) -> None:
+        """
+        Добавляем (text, rating, date, autor_profile). Уже известный текст
+        не дублируем, только обновляем рейтинг и дату, если узнали их.
+        commit=False - закоммитит потом commit(), одним разом на пачку.
+        """
+        db = self._conn()
+        if db is None:
+            return
+
+        db.executemany(
+            "INSERT INTO jokes (text, rating, date, autor_profile) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (text) DO UPDATE SET "
+            "rating = coalesce(excluded.rating, rating), date = coalesce(date, excluded.date)",
+            list(jokes),
+        )
+
+        if commit:
+            db.commit()
+
+    def commit(self) -> None:
+        if self._db is not None:
+            self._db.commit()
+
+    def search(self, query: str, limit: int) -> Tuple[int, List[dict]]:
+        """
+        Анекдоты, где есть все слова запроса, по релевантности (BM25),
+        при равной - по рейтингу. Вернёт (сколько всего нашлось, первые limit).
+        Это сотни миллисекунд на частом слове - из event loop звать через пул.
+        """
+        db = self._reader()
+        match = _match_query(query)
+
+        if db is None or not match:
+            return 0, []
+
+        total = db.execute(
+            "SELECT count(*) FROM jokes_fts WHERE jokes_fts MATCH ?", (match,)
+        ).fetchone()[0]
+
+        # сначала top по BM25 внутри FTS5 (у него для ORDER BY rank LIMIT свой быстрый путь),
+        # и только эти строки тянем из jokes
+        rows = db.execute(
+            "SELECT j.text, j.autor_profile, j.rating, j.date, f.rank "
+            "FROM (SELECT rowid, rank FROM jokes_fts WHERE jokes_fts MATCH ? "
+            "      ORDER BY rank LIMIT ?) f "
+            "JOIN jokes j ON j.id = f.rowid "
+            "ORDER BY f.rank, j.rating DESC",
+            (match, limit),
+        ).fetchall()
+
+        return total, [
+            {
+                "text": text,
+                "autor_profile": profile,
+                "rating": rating,
+                "date": date,
+                # bm25() в SQLite отрицательный: чем меньше, тем лучше
+                "score": -rank,
+            }
+            for text, profile, rating, date, rank in rows
+        ]
+
+    def close(self) -> None:
+        with self._readers_lock:
+            for reader in self._readers.values():
+                reader.close()
+
+            self._readers.clear()
+
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        db = self._reader()
+
+        if db is None:
+            return {"available": False, "jokes": 0}
+
+        return {
+            "available": True,
+            "jokes": db.execute("SELECT count(*) FROM jokes").fetchone()[0],
+        }
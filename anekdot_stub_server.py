@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import itertools
+import os
+import random
+from pathlib import Path
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import HTMLResponse
+
+# Локальная подмена anekdot.ru: отдаёт сохранённые страницы из fixtures/anekdot,
+# чтобы гонять anekdot_app и бенчмарки без сети.
+#   best_<YYYY-MM-DD>.html - страница конкретного дня, если есть, иначе best_day.html
+#   random*.html           - страницы /random/anekdot/ по кругу
+FIXTURES_DIR = Path(os.getenv("STUB_FIXTURES_DIR", Path(__file__).parent / "fixtures" / "anekdot"))
+LATENCY = float(os.getenv("STUB_LATENCY", "0"))  # секунды на каждый ответ
+JITTER = float(os.getenv("STUB_JITTER", "0"))  # +- случайная добавка к задержке
+ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))  # доля ответов 503
+
+app = FastAPI(title="anekdot.ru stub")
+
+_pages: dict[str, str] = {}
+_random_pages = itertools.cycle(sorted(FIXTURES_DIR.glob("random*.html")) or [None])
+
+
+def _read(path: Path) -> str:
+    if path.name not in _pages:
+        _pages[path.name] = path.read_text(encoding="utf-8")
+    return _pages[path.name]
+
+
+async def _misbehave() -> None:
+    delay = LATENCY + random.uniform(-JITTER, JITTER)
+
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        raise HTTPException(status_code=503, detail="stub: искусственная ошибка")
+
+
+@app.get("/release/anekdot/day/{date}/", response_class=HTMLResponse)
+async def best_day(date: str):
+    await _misbehave()
+
+    path = FIXTURES_DIR / f"best_{date}.html"
+    if not path.exists():
+        path = FIXTURES_DIR / "best_day.html"
+
+    return _read(path)
+
+
+@app.get("/random/anekdot/", response_class=HTMLResponse)
+async def random_page():
+    await _misbehave()
+
+    path = next(_random_pages)
+    if path is None:
+        raise HTTPException(status_code=404, detail="stub: нет random*.html в фикстурах")
+
+    return _read(path)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Локальная подмена anekdot.ru")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="задержка ответа, сек")
+    parser.add_argument("--jitter", type=float, default=JITTER, help="разброс задержки, сек")
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE, help="доля ответов 503, 0..1")
+    args = parser.parse_args()
+
+    LATENCY = args.latency
+    JITTER = args.jitter
+    ERROR_RATE = args.error_rate
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
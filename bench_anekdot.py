@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import httpx
+
+from anekdot_app import _parse_jokes_by_ratings, _load_page, parse_best_html, parse_input_date
+
+ROOT = Path(__file__).parent
+FIXTURES_DIR = ROOT / "fixtures" / "anekdot"
+
+
+def micro(label: str, func: Callable[[], object], number: int) -> Dict[str, float]:
+    """Лучшее из 5 повторов по number вызовов, время одного вызова в мкс."""
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"  {label:40} {best * 1e6:12.1f} мкс")
+    return {"name": label, "us_per_call": best * 1e6}
+
+
+def run_micro() -> List[Dict[str, float]]:
+    print("Микробенчмарки")
+
+    html = (FIXTURES_DIR / "best_day.html").read_text(encoding="utf-8")
+    text, _ = _load_page(html, "bs4")
+
+    return [
+        micro("_parse_jokes_by_ratings (best_day)", lambda: _parse_jokes_by_ratings(text), 20),
+        micro("parse_best_html [bs4]", lambda: parse_best_html(html, "bs4"), 5),
+        micro("parse_best_html [lxml]", lambda: parse_best_html(html, "lxml"), 20),
+        micro("parse_input_date", lambda: parse_input_date("01-January-2025"), 2000),
+    ]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start(args: List[str], env: Dict[str, str], health_url: str) -> subprocess.Popen:
+    proc = subprocess.Popen(args, cwd=ROOT, env={**os.environ, **env})
+
+    deadline = time.monotonic() + 20
+
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(health_url, timeout=0.5)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+
+    proc.kill()
+    raise RuntimeError(f"Сервер не поднялся: {' '.join(args)}")
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def load(url_for: Callable[[int], str], requests: int, concurrency: int) -> Dict[str, float]:
+    """Гоняем requests запросов в concurrency потоков, считаем req/s и перцентили."""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+
+        for i in counter:
+            t0 = time.perf_counter()
+            resp = await client.get(url_for(i))
+            latencies.append(time.perf_counter() - t0)
+
+            if resp.status_code != 200:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        total = time.perf_counter() - t0
+
+    ordered = sorted(latencies)
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": requests / total,
+        "p50_ms": _percentile(ordered, 0.50) * 1000,
+        "p90_ms": _percentile(ordered, 0.90) * 1000,
+        "p99_ms": _percentile(ordered, 0.99) * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+    }
+
+
+def run_e2e(args: argparse.Namespace) -> List[Dict[str, float]]:
+    # базы приложения - только во временной папке: иначе страницы подмены осели бы
+    # в настоящем кэше, и прошлые даты (они не протухают) отдавались бы из него
+    with tempfile.TemporaryDirectory(prefix="bench_anekdot_") as tmp:
+        return _run_e2e(args, Path(tmp))
+
+
+def _run_e2e(args: argparse.Namespace, tmp: Path) -> List[Dict[str, float]]:
+    stub_port = _free_port()
+    app_port = _free_port()
+
+    stub = _start(
+        [sys.executable, "anekdot_stub_server.py", "--port", str(stub_port),
+         "--latency", str(args.latency), "--error-rate", str(args.error_rate)],
+        {},
+        f"http://127.0.0.1:{stub_port}/docs",
+    )
+
+    env = {
+        "ANEKDOT_BASE_URL": f"http://127.0.0.1:{stub_port}",
+        "ANEKDOT_PARSE_EXECUTOR": args.executor,
+        "ANEKDOT_HTML_BACKEND": args.backend,
+        "ANEKDOT_BEST_CACHE_DB": str(tmp / "cache.sqlite3"),
+        "ANEKDOT_SEARCH_DB": str(tmp / "search.sqlite3"),
+    }
+
+    # без --cache меряем весь путь: загрузка + разбор на каждый запрос
+    if not args.cache:
+        env.update({"ANEKDOT_BEST_CACHE_SIZE": "0", "ANEKDOT_BEST_CACHE_DB": ""})
+
+    try:
+        app_proc = _start(
+            [sys.executable, "-m", "uvicorn", "anekdot_app:app",
+             "--port", str(app_port), "--log-level", "warning"],
+            env,
+            f"http://127.0.0.1:{app_port}/stats/pool",
+        )
+
+    except Exception:
+        stub.terminate()
+        raise
+
+    base = f"http://127.0.0.1:{app_port}"
+    # разные даты, чтобы одновременные запросы не склеивались в один
+    day = "{:02d}-January-2024"
+    results = []
+
+    try:
+        print(f"\nEnd-to-end (задержка подмены {args.latency * 1000:.0f} мс, "
+              f"ошибки {args.error_rate:.0%}, парсер {args.backend}/{args.executor})")
+
+        for label, url_for in (
+            ("/best", lambda i: f"{base}/best?date={day.format(i % 28 + 1)}"),
+            ("/random", lambda i: f"{base}/random?count=5"),
+        ):
+            stats = asyncio.run(load(url_for, args.requests, args.concurrency))
+            stats["name"] = label
+            results.append(stats)
+
+            print(
+                f"  {label:8} {stats['rps']:8.1f} req/s  p50 {stats['p50_ms']:7.1f} мс  "
+                f"p90 {stats['p90_ms']:7.1f} мс  p99 {stats['p99_ms']:7.1f} мс  ошибок {stats['errors']}"
+            )
+
+    finally:
+        app_proc.terminate()
+        stub.terminate()
+        app_proc.wait()
+        stub.wait()
+
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Бенчмарки anekdot_app без сети")
+    parser.add_argument("--requests", type=int, default=500, help="запросов на эндпоинт")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка подмены anekdot.ru, сек")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--backend", default="lxml", choices=["bs4", "lxml"])
+    parser.add_argument("--executor", default="process", choices=["process", "thread", "inline"])
+    parser.add_argument("--cache", action="store_true", help="не отключать кэш /best")
+    parser.add_argument("--skip-e2e", action="store_true", help="только микробенчмарки")
+    parser.add_argument("--json", help="куда сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    results = {"micro": run_micro()}
+
+    if not args.skip_e2e:
+        results["e2e"] = run_e2e(args)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
+
+#Всё крутится локально: anekdot_stub_server.py отдаёт страницы из fixtures/anekdot,
+#anekdot_app запускается отдельным процессом с ANEKDOT_BASE_URL на подмену
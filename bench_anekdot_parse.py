@@ -0,0 +1,86 @@
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+import anekdot_app
+from anekdot_app import AuthorIndex, Joke, parse_best_html, parse_random_html
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "anekdot"
+REPEAT = 20
+
+
+class _SoupFindLookup:
+    """Старый вариант поиска автора: soup.find по всему дереву на каждый анекдот."""
+
+    def __init__(self, soup: BeautifulSoup) -> None:
+        self.soup = soup
+
+    def get(self, name: str) -> Optional[str]:
+        a = self.soup.find("a", string=lambda s: s and s.strip() == name)
+
+        if not a:
+            return None
+
+        return a.get("href")
+
+
+def _bs4_find_backend(html: str) -> Tuple[str, Callable[[], AuthorIndex]]:
+    soup = BeautifulSoup(html, "lxml")
+    return soup.get_text("\n", strip=True), lambda: _SoupFindLookup(soup)
+
+
+def bench(parse: Callable[[str, str], List[Joke]], html: str, backend: str) -> float:
+    """Лучшее время из REPEAT прогонов, в миллисекундах."""
+    best = float("inf")
+
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        parse(html, backend)
+        best = min(best, time.perf_counter() - t0)
+
+    return best * 1000
+
+
+def main():
+
+    cases = [
+        ("parse_best_html", "best_day.html", parse_best_html),
+        ("parse_random_html", "random.html", parse_random_html),
+    ]
+
+    # старую реализацию подключаем как ещё один бэкенд, только на время замера
+    anekdot_app.HTML_BACKENDS["bs4-find"] = _bs4_find_backend
+
+    try:
+        for label, fixture, parse in cases:
+
+            html = (FIXTURES_DIR / fixture).read_text(encoding="utf-8")
+
+            baseline = parse(html, "bs4-find")
+            baseline_time = bench(parse, html, "bs4-find")
+
+            print(f"{label} ({fixture}, анекдотов: {len(baseline)})")
+            print(f"  {'bs4-find':9}: {baseline_time:7.2f} мс")
+
+            for backend in ("bs4", "lxml"):
+
+                jokes = parse(html, backend)
+                backend_time = bench(parse, html, backend)
+
+                print(
+                    f"  {backend:9}: {backend_time:7.2f} мс, "
+                    f"ускорение x{baseline_time / backend_time:.2f}, "
+                    f"результат совпадает: {jokes == baseline}"
+                )
+
+    finally:
+        del anekdot_app.HTML_BACKENDS["bs4-find"]
+
+
+if __name__ == "__main__":
+    main()
+
+#Фикстуры в fixtures/anekdot собраны по разметке anekdot.ru (topicbox / votingbox / auth),
+#чтобы бенчмарк гонялся без сети. bs4-find - как было до индекса авторов
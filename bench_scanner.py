@@ -0,0 +1,192 @@
+import argparse
+import asyncio
+import io
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+
+from aiohttp import web
+
+import scanner
+from scanner_store import ResultStore
+
+BODY = b"x" * 256 * 1024  # "страница" в 256 КБ, которую проверке скачивать незачем
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def page(request: web.Request) -> web.Response:
+    return web.Response(body=BODY)
+
+
+async def no_head(request: web.Request) -> web.Response:
+    # как некоторые реальные сайты: HEAD не поддерживаем
+    if request.method == "HEAD":
+        return web.Response(status=405)
+    return web.Response(body=BODY)
+
+
+def run_server(port: int) -> None:
+    app = web.Application()
+    app.router.add_get("/page/{i}", page)
+    app.router.add_route("*", "/nohead/{i}", no_head)
+    # reuse_port: несколько процессов-серверов слушают один порт, ядро делит соединения
+    web.run_app(app, host="127.0.0.1", port=port, print=None, access_log=None, reuse_port=True)
+
+
+def start_servers(port: int, count: int):
+    servers = [multiprocessing.Process(target=run_server, args=(port,), daemon=True) for _ in range(count)]
+
+    for server in servers:
+        server.start()
+
+    deadline = time.monotonic() + 10
+
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return servers
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+BAD_URLS = ("http://256.256.256.256/{i}", "https://invalid.invalid/{i}")
+
+
+def make_urls(port: int, count: int, no_head_share: float, bad_share: float = 0.0):
+    every = round(1 / no_head_share) if no_head_share else 0
+    bad_every = round(1 / bad_share) if bad_share else 0
+
+    for i in range(count):
+        if bad_every and i % bad_every == 1:
+            yield BAD_URLS[i // bad_every % 2].format(i=i)
+            continue
+
+        # половина через localhost - там есть что кэшировать в DNS
+        host = "localhost" if i % 2 else "127.0.0.1"
+        path = "nohead" if every and i % every == 0 else "page"
+        yield f"http://{host}:{port}/{path}/{i}"
+
+
+async def run(
+    port: int,
+    count: int,
+    limit: int,
+    mode: str,
+    head_first: bool,
+    adaptive: bool,
+    no_head_share: float,
+    bad_share: float,
+    pre_resolve: bool,
+) -> None:
+    out = io.StringIO()
+
+    t0 = time.perf_counter()
+
+    counts = await scanner.scan(
+        make_urls(port, count, no_head_share, bad_share),
+        count,
+        limit,
+        scanner.write_lines(out),
+        connector_mode=mode,
+        head_first=head_first,
+        progress=False,
+        adaptive=adaptive,
+        pre_resolve=pre_resolve,
+    )
+    dt = time.perf_counter() - t0
+
+    label = f"{mode} + {'HEAD->GET' if head_first else 'GET'}{' + AIMD' if adaptive else ''}{' + DNS' if pre_resolve else ''}"
+    print(f"  {label:33} {count / dt:8.1f} проверок/с  ({dt:.2f} с, OK: {counts['ok']}, ошибок: {counts['bad']})")
+
+
+def run_sharded(port: int, count: int, limit: int, processes: int, no_head_share: float) -> float:
+    # scan_sharded читает урлы из файла и пишет в базу, как и scanner.main
+    with tempfile.TemporaryDirectory() as tmp:
+        urls_file = os.path.join(tmp, "urls.txt")
+        results_file = os.path.join(tmp, "results.txt")
+        store_file = os.path.join(tmp, "results.sqlite3")
+
+        with open(urls_file, "w", encoding="utf-8") as f:
+            f.writelines(url + "\n" for url in make_urls(port, count, no_head_share))
+
+        t0 = time.perf_counter()
+        counts = scanner.scan_sharded(urls_file, store_file, count, limit, processes, progress=False)
+        dt = time.perf_counter() - t0
+
+        store = ResultStore(store_file)
+        scanner.export_results(urls_file, results_file, store)
+        store.close()
+
+        with open(results_file, encoding="utf-8") as f:
+            ordered = [line.split(" - ")[0] for line in f] == list(make_urls(port, count, no_head_share))
+
+    label = f"{processes} процесс(а)"
+    print(
+        f"  {label:33} {count / dt:8.1f} проверок/с  "
+        f"({dt:.2f} с, OK: {counts['ok']}, ошибок: {counts['bad']}, порядок {'сохранён' if ordered else 'НАРУШЕН'})"
+    )
+    return count / dt
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Сколько проверок в секунду делает scanner на локальном сервере")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--no-head-share", type=float, default=0.1, help="доля урлов, где HEAD отдаёт 405")
+    parser.add_argument("--bad-share", type=float, default=0.1, help="доля урлов с битым IP или несуществующим доменом")
+    parser.add_argument(
+        "--processes", default="1,2,4",
+        help="через запятую: сколько процессов scanner пробовать в режиме шардов (0 - пропустить)",
+    )
+    args = parser.parse_args()
+
+    processes = [int(p) for p in args.processes.split(",") if int(p) > 0]
+
+    port = _free_port()
+    # серверов столько же, сколько максимум процессов сканера, чтобы упираться не в сервер
+    servers = start_servers(port, max(processes + [1]))
+
+    try:
+        print(f"{args.count} урлов, {args.limit} одновременно, тело ответа {len(BODY) // 1024} КБ")
+
+        print(f"битых урлов {args.bad_share:.0%}")
+
+        for mode, head_first, adaptive, pre_resolve in (
+            ("default", False, False, False),
+            ("tuned", False, False, False),
+            ("tuned", True, False, False),
+            ("tuned", True, True, False),
+            ("tuned", True, True, True),
+        ):
+            asyncio.run(run(
+                port, args.count, args.limit, mode, head_first, adaptive,
+                args.no_head_share, args.bad_share, pre_resolve,
+            ))
+
+        if processes:
+            print(f"\nШарды по процессам ({os.cpu_count()} CPU, {len(servers)} процесс(а) сервера)")
+            base = None
+
+            for n in processes:
+                rate = run_sharded(port, args.count, args.limit, n, args.no_head_share)
+                base = base or rate
+                print(f"    ускорение x{rate / base:.2f} (идеал x{n / processes[0]:.0f})")
+
+    finally:
+        for server in servers:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import json
+
+import task1
+
+# Сравниваем, как частичные результаты из процессов попадают к родителю:
+# pickle через pipe против записи воркером в общий shared_memory буфер.
+#   scalar - частичная сумма на чанк (run_processes против run_shm_processes)
+#   array  - массив квадратов целиком (squares_pickle против squares_shm)
+# Пул один и тёплый, так что меряется только счёт и передача результата.
+
+
+async def measure(run, workers: int, executor, expected: int, warmup: int, repeat: int) -> dict:
+    times = []
+
+    for i in range(warmup + repeat):
+        result, dt, _ = await run(workers, executor=executor)
+
+        if result != expected:
+            raise RuntimeError(f"неверный результат: {result} != {expected}")
+
+        if i >= warmup:
+            times.append(dt)
+
+    return task1.describe(times)
+
+
+async def bench(sizes, workers: int, warmup: int, repeat: int) -> list:
+    executor, _ = task1.warm_pool.get(workers)
+    results = []
+
+    print(f"  {'выход':7} {'N':>11} {'pickle, мс':>12} {'shm, мс':>10}  {'shm быстрее':>12}")
+
+    for n in sizes:
+        task1.N = n
+        expected = task1.sum_of_squares_formula(n)
+
+        cases = [
+            (
+                "scalar",
+                lambda w, executor: task1.run_processes(w, "numpy", executor),
+                lambda w, executor: task1.run_shm_processes(w, "numpy", executor),
+            ),
+            ("array", task1.squares_pickle, task1.squares_shm),
+        ]
+
+        for output, pickle_run, shm_run in cases:
+            pickled = await measure(pickle_run, workers, executor, expected, warmup, repeat)
+            shared = await measure(shm_run, workers, executor, expected, warmup, repeat)
+
+            print(
+                f"  {output:7} {n:11d} {pickled['median'] * 1000:12.2f} {shared['median'] * 1000:10.2f}  "
+                f"{'x' + format(pickled['median'] / shared['median'], '.2f'):>12}"
+            )
+
+            results.append({"output": output, "n": n, "workers": workers, "pickle": pickled, "shm": shared})
+
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="pickle против shared_memory для результатов процессов task1")
+    parser.add_argument("--sizes", default="100000,1000000,10000000", help="значения N через запятую")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="куда сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    if task1.np is None:
+        parser.error("нужен numpy: массивный выход считается через него")
+
+    sizes = [int(n) for n in args.sizes.split(",")]
+
+    print(f"Воркеров {args.workers}, прогрев {args.warmup}, замеров {args.repeat}, медианы\n")
+
+    try:
+        results = asyncio.run(bench(sizes, args.workers, args.warmup, args.repeat))
+
+    finally:
+        task1.warm_pool.close()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"machine": task1.machine_info(), "results": results}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import os
+import socket
+import sqlite3
+import sys
+import warnings
+import tempfile
+from pathlib import Path
+
+SESSIONS = 2
+RANGE_DAYS = 11  # /best/range с 10 по 20 января
+
+# Приложение поднимается и гасится несколько раз в одном процессе (как в тестах
+# с TestClient): каждый lifespan - свой event loop, и всё, что привязано к loop,
+# должно создаваться на старте, а не при импорте модуля.
+
+
+def main() -> int:
+    errors = []
+
+    with tempfile.TemporaryDirectory(prefix="check_app_restart_") as tmp:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            stub_port = s.getsockname()[1]
+
+        # настройки anekdot_app читает при импорте - env выставляем до него
+        os.environ.update({
+            "ANEKDOT_BASE_URL": f"http://127.0.0.1:{stub_port}",
+            "ANEKDOT_BEST_CACHE_DB": str(Path(tmp) / "cache.sqlite3"),
+            "ANEKDOT_SEARCH_DB": str(Path(tmp) / "search.sqlite3"),
+            "ANEKDOT_PARSE_EXECUTOR": "thread",
+            "ANEKDOT_PARSE_QUEUE": "1",  # чтобы дни из /best/range толкались за слот разбора
+        })
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # starlette ворчит на httpx в TestClient
+            from fastapi.testclient import TestClient
+
+        import anekdot_app
+        from bench_anekdot import _start
+
+        stub = _start(
+            [sys.executable, "anekdot_stub_server.py", "--port", str(stub_port), "--latency", "0.01"],
+            {},
+            f"http://127.0.0.1:{stub_port}/docs",
+        )
+
+        try:
+            writes = 0
+
+            for session in range(SESSIONS):
+                with TestClient(anekdot_app.app) as client:
+                    resp = client.get("/best", params={"date": f"{session + 1:02d}-January-2024"})
+
+                    if resp.status_code != 200:
+                        errors.append(f"сессия {session}: /best {resp.status_code}")
+
+                    resp = client.get(
+                        "/best/range",
+                        params={"from": f"10-January-{2020 + session}", "to": f"{9 + RANGE_DAYS}-January-{2020 + session}"},
+                    )
+
+                    if resp.status_code != 200:
+                        errors.append(f"сессия {session}: /best/range {resp.status_code}")
+
+                    resp = client.get("/random", params={"count": 3})
+
+                    if resp.status_code != 200:
+                        errors.append(f"сессия {session}: /random {resp.status_code}")
+
+                # /best пишет и в кэш, и в поиск; очередь на выходе дописывается
+                writer = anekdot_app.disk_writer.stats()
+                if writer["writes"] < writes + 2:
+                    errors.append(f"сессия {session}: фоновых записей {writer['writes'] - writes}")
+
+                writes = writer["writes"]
+
+        finally:
+            stub.terminate()
+            stub.wait()
+
+        with sqlite3.connect(Path(tmp) / "cache.sqlite3") as db:
+            cached = db.execute("SELECT count(*) FROM best").fetchone()[0]
+
+        if cached != SESSIONS * (1 + RANGE_DAYS):
+            errors.append(f"в кэше на диске {cached} дней из {SESSIONS * (1 + RANGE_DAYS)}")
+
+    for error in errors:
+        print(f"FAIL {error}")
+
+    print(f"Сессий: {SESSIONS}, ошибок: {len(errors)}")
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
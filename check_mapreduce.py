@@ -0,0 +1,100 @@
+import asyncio
+import operator
+import sys
+import time
+
+from mapreduce import BACKENDS, MapReduce
+from task1 import split_range, sum_of_squares_formula, sum_of_squares_range
+
+N = 200_000
+CHUNKS = 40
+
+
+def count_primes(start: int, end: int) -> int:
+    # другое ядро, чтобы движок не был завязан на сумму квадратов
+    return sum(1 for n in range(max(start, 2), end + 1) if all(n % d for d in range(2, int(n ** 0.5) + 1)))
+
+
+def slow_square_sum(start: int, end: int) -> int:
+    time.sleep(0.01)
+    return sum_of_squares_range(start, end)
+
+
+def failing(start: int, end: int) -> int:
+    if start > 1:
+        raise ValueError(f"чанк {start}-{end}")
+    return 0
+
+
+async def check_backend(backend: str) -> list:
+    errors = []
+
+    with MapReduce(backend, workers=2) as mapreduce:
+
+        got = await mapreduce.reduce(sum_of_squares_range, split_range(N, CHUNKS), operator.add, 0)
+        if got != sum_of_squares_formula(N):
+            errors.append(f"{backend}: сумма квадратов {got}")
+
+        got = await mapreduce.reduce(count_primes, split_range(10_000, 7), operator.add, 0)
+        if got != 1229:
+            errors.append(f"{backend}: простых до 10000 {got}, а не 1229")
+
+        # частичные результаты приходят по одному на кусок и уже свёрнутыми
+        seen = []
+        await mapreduce.reduce(
+            sum_of_squares_range, split_range(N, CHUNKS), operator.add, 0,
+            on_partial=lambda rng, value, acc: seen.append(acc),
+        )
+        if len(seen) != CHUNKS or seen != sorted(seen) or seen[-1] != sum_of_squares_formula(N):
+            errors.append(f"{backend}: частичные суммы {len(seen)} шт.")
+
+        # ранняя остановка: прочитали 3 куска из 40 - остальные не считаются
+        submitted = []
+
+        def ranges():
+            for rng in split_range(N, CHUNKS):
+                submitted.append(rng)
+                yield rng
+
+        stream = mapreduce.partials(slow_square_sum, ranges(), window=4)
+        got = 0
+
+        async for _ in stream:
+            got += 1
+            if got == 3:
+                break
+
+        await stream.aclose()
+
+        if len(submitted) > 3 + 4:
+            errors.append(f"{backend}: после остановки отправлено {len(submitted)} кусков")
+
+        # ошибка ядра доходит до вызывающего
+        try:
+            await mapreduce.reduce(failing, split_range(100, 4), operator.add, 0)
+            errors.append(f"{backend}: ошибка ядра потерялась")
+
+        except ValueError:
+            pass
+
+    return errors
+
+
+def main() -> int:
+    errors = []
+
+    for backend in BACKENDS:
+        t0 = time.perf_counter()
+        errors += asyncio.run(check_backend(backend))
+        print(f"{backend:8} {time.perf_counter() - t0:.2f} с")
+
+    for error in errors:
+        print(f"FAIL {error}")
+
+    print(f"Ошибок: {len(errors)}")
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from fastapi import HTTPException
+
+from anekdot_app import _parse_date_cached, parse_input_date
+
+THREADS = 32
+ROUNDS = 2
+
+MONTHS = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+]
+
+BAD_INPUTS = [
+    "", "2025-01-01", "32-January-2025", "29-February-2023", "00-March-2025",
+    "01-Jan-2025", "01-Январь-2025", "01-January-25", "01 January 2025",
+    "001-January-2025", "01-January-2025 ", "１-January-2025",
+]
+
+
+def expected_cases():
+    """Каждый день 2000-2030 в разных написаниях и с ожидаемым ответом."""
+    day = date(2000, 1, 1)
+
+    while day.year <= 2030:
+        name = MONTHS[day.month - 1]
+        iso = day.isoformat()
+
+        yield f"{day.day:02d}-{name}-{day.year}", iso
+        yield f"{day.day}-{name.lower()}-{day.year}", iso
+        yield f"{day.day:02d}-{name.upper()}-{day.year}", iso
+
+        day += timedelta(days=1)
+
+
+def check(cases):
+    errors = []
+
+    for date_str, want in cases:
+        try:
+            got = parse_input_date(date_str)
+        except HTTPException:
+            got = None
+
+        if got != want:
+            errors.append((date_str, want, got))
+
+    return errors
+
+
+def main() -> int:
+    """
+    Гоняем parse_input_date из многих потоков сразу и сверяем с календарём.
+    С переключением LC_TIME такие прогоны ловили чужую локаль посреди strptime.
+    """
+    cases = list(expected_cases()) + [(s, None) for s in BAD_INPUTS]
+
+    # каждый поток получает тот же набор в своём порядке, чтобы попадания в кэш перемешались
+    batches = [cases[i % len(cases):] + cases[:i % len(cases)] for i in range(THREADS * ROUNDS)]
+
+    _parse_date_cached.cache_clear()
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        results = list(executor.map(check, batches))
+
+    errors = [e for batch in results for e in batch]
+
+    for date_str, want, got in errors[:10]:
+        print(f"FAIL {date_str!r}: ожидали {want!r}, получили {got!r}")
+
+    print(f"Потоков: {THREADS}, проверок: {len(cases) * len(batches)}, ошибок: {len(errors)}")
+    print(f"Кэш: {_parse_date_cached.cache_info()}")
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+from anekdot_app import HTML_BACKENDS, parse_best_html, parse_random_html
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "anekdot"
+REFERENCE_BACKEND = "bs4"
+
+
+def main() -> int:
+    """
+    Все бэкенды должны выдавать ровно те же Joke, что и BeautifulSoup.
+    Страницы best*.html разбираем как /best, random*.html - как /random.
+    """
+    parsers = {"best": parse_best_html, "random": parse_random_html}
+    failed = 0
+    checked = 0
+
+    for path in sorted(FIXTURES_DIR.glob("*.html")):
+
+        parse = parsers.get(path.stem.split("_")[0])
+
+        if parse is None:
+            continue
+
+        html = path.read_text(encoding="utf-8")
+        expected = parse(html, REFERENCE_BACKEND)
+
+        for backend in HTML_BACKENDS:
+
+            if backend == REFERENCE_BACKEND:
+                continue
+
+            checked += 1
+            got = parse(html, backend)
+
+            if got == expected:
+                print(f"OK   {path.name} [{backend}]")
+                continue
+
+            failed += 1
+            print(f"FAIL {path.name} [{backend}]: {len(got)} анекдотов против {len(expected)}")
+
+            for want, have in zip(expected, got):
+                if want != have:
+                    print(f"     ожидали: {want!r}")
+                    print(f"     получили: {have!r}")
+                    break
+
+    print(f"\nПроверено: {checked}, расхождений: {failed}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import asyncio
+import socket
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+import scanner
+
+HOSTS = 30
+URLS_PER_HOST = 3
+LOOKUP_SECONDS = 1.0  # каждый резолв медленный, но укладывается в RESOLVE_TIMEOUT
+HANGING_HOST = "hang.example"  # этот не отвечает вовсе - таймаут
+MEMORY_SIZES = (10_000, 50_000)  # уникальных хостов во входе
+
+lookups: Counter = Counter()
+
+
+def slow_getaddrinfo(host, *args, **kwargs):
+    lookups[host] += 1
+
+    if host == HANGING_HOST:
+        time.sleep(scanner.RESOLVE_TIMEOUT * 2)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", 0))]
+
+    time.sleep(LOOKUP_SECONDS)
+
+    if host.endswith(".invalid"):
+        raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+
+    return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", 0))]
+
+
+def instant_getaddrinfo(host, *args, **kwargs):
+    raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+
+
+async def check_slow() -> list:
+    """
+    Медленный резолвер (1 с на хост при таймауте 2 с) и больше хостов, чем
+    потоков в пуле loop по умолчанию: хорошие хосты не должны отбраковываться
+    из-за очереди, зависший - должен уйти в HTTP-фазу, а урлы одного хоста -
+    ждать один резолв.
+    """
+    hosts = [f"good{i}.example" for i in range(HOSTS)] + [f"bad{i}.invalid" for i in range(5)] + [HANGING_HOST]
+    resolver = scanner.HostResolver()
+
+    try:
+        statuses = await asyncio.gather(*(resolver.check(host) for host in hosts * URLS_PER_HOST))
+
+    finally:
+        resolver.close()
+
+    got = dict(zip(hosts, statuses))
+    errors = []
+
+    wrongly = [host for host in hosts if host.startswith("good") and got[host] is not None]
+    if wrongly:
+        errors.append(f"отбракованы резолвящиеся хосты: {len(wrongly)} из {HOSTS}")
+
+    if got[HANGING_HOST] is not None:
+        errors.append(f"хост с таймаутом отбракован: {got[HANGING_HOST]}")
+
+    missed = [host for host in hosts if host.endswith(".invalid") and got[host] != "ERROR (DNS)"]
+    if missed:
+        errors.append(f"не отбракованы несуществующие: {missed}")
+
+    repeated = [host for host in hosts if lookups[host] != 1]
+    if repeated:
+        errors.append(f"хосты резолвились больше одного раза: {len(repeated)}")
+
+    return errors
+
+
+async def scan_bad_hosts(count: int) -> int:
+    """count урлов с разными несуществующими хостами через scan; вернёт пик памяти в байтах."""
+    statuses: Counter = Counter()
+
+    def on_result(index: int, url: str, status: str, timing: scanner.Timing) -> None:
+        statuses[status] += 1
+
+    urls = (f"http://host{i}.invalid/" for i in range(count))
+
+    tracemalloc.start()
+
+    try:
+        await scanner.scan(urls, count, 10, on_result, progress=False, adaptive=False)
+        _, peak = tracemalloc.get_traced_memory()
+
+    finally:
+        tracemalloc.stop()
+
+    if statuses != {"ERROR (DNS)": count}:
+        raise RuntimeError(f"неожиданные статусы: {dict(statuses)}")
+
+    return peak
+
+
+def main() -> int:
+    socket.getaddrinfo = slow_getaddrinfo
+
+    t0 = time.perf_counter()
+    errors = asyncio.run(check_slow())
+    print(f"Медленный резолвер: {HOSTS + 6} хостов по {URLS_PER_HOST} урла за {time.perf_counter() - t0:.1f} с")
+
+    # память не должна расти с числом уникальных хостов: кэш ограничен
+    socket.getaddrinfo = instant_getaddrinfo
+    peaks = [asyncio.run(scan_bad_hosts(count)) for count in MEMORY_SIZES]
+
+    for count, peak in zip(MEMORY_SIZES, peaks):
+        print(f"Уникальных хостов {count:7d}: пик памяти {peak / 2 ** 20:.1f} МБ")
+
+    if peaks[1] > peaks[0] * 1.5:
+        errors.append(f"память растёт со входом: {peaks[0] / 2 ** 20:.1f} -> {peaks[1] / 2 ** 20:.1f} МБ")
+
+    for error in errors:
+        print(f"FAIL {error}")
+
+    print(f"Ошибок: {len(errors)}")
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
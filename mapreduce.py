@@ -0,0 +1,140 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, Optional, Tuple, TypeVar
+
+# Разбить диапазон на куски, раздать ядру, собрать ответы и свернуть - одинаково
+# для потоков, процессов и "просто в этом же потоке". Ядро - любая функция
+# kernel(start, end) уровня модуля (для процессов её надо уметь pickle).
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+Range = Tuple[int, int]
+
+BACKENDS = ("thread", "process", "inline")
+
+
+class MapReduce:
+    """
+    backend: "thread", "process" или "inline" (ядро прямо в event loop, без пула).
+    Пул можно передать готовый (executor), тогда close() его не трогает;
+    иначе создаётся свой на workers воркеров.
+    """
+
+    def __init__(self, backend: str = "process", workers: Optional[int] = None, executor: Optional[Executor] = None):
+
+        if backend not in BACKENDS:
+            raise ValueError(f"Неизвестный backend: {backend}")
+
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self._own_executor = executor is None and backend != "inline"
+
+        if executor is None and backend == "thread":
+            executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        elif executor is None and backend == "process":
+            executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        self.executor = executor
+
+    def _submit(self, loop: asyncio.AbstractEventLoop, kernel: Callable[[int, int], T], rng: Range) -> "asyncio.Future[T]":
+
+        if self.backend != "inline":
+            return loop.run_in_executor(self.executor, kernel, *rng)
+
+        # inline: считаем сразу, но отдаём как future, чтобы дальше всё шло одним путём
+        future = loop.create_future()
+
+        try:
+            future.set_result(kernel(*rng))
+
+        except Exception as e:
+            future.set_exception(e)
+
+        return future
+
+    async def partials(
+        self,
+        kernel: Callable[[int, int], T],
+        ranges: Iterable[Range],
+        window: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[Range, T]]:
+        """
+        Отдаёт (кусок, результат) в порядке готовности. В полёте не больше
+        window кусков (по умолчанию 2 на воркер), следующий кусок берётся из
+        ranges только когда есть место - ranges может быть ленивым и решать
+        размер по уже пришедшим результатам. Если перестать читать и вызвать
+        aclose(), ещё не начатые куски отменяются.
+        """
+        ranges = iter(ranges)
+        window = window or 2 * self.workers
+        loop = asyncio.get_running_loop()
+        pending: Dict["asyncio.Future[T]", Range] = {}
+
+        try:
+            while True:
+
+                while len(pending) < window:
+
+                    rng = next(ranges, None)
+                    if rng is None:
+                        break
+
+                    pending[self._submit(loop, kernel, rng)] = rng
+
+                if not pending:
+                    return
+
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for future in done:
+                    yield pending.pop(future), future.result()
+
+        finally:
+            # уже работающие в пуле досчитаются, но их результат никому не нужен
+            for future in pending:
+                future.cancel()
+
+    async def reduce(
+        self,
+        kernel: Callable[[int, int], T],
+        ranges: Iterable[Range],
+        reducer: Callable[[R, T], R],
+        initial: R,
+        on_partial: Optional[Callable[[Range, T, R], None]] = None,
+        window: Optional[int] = None,
+    ) -> R:
+        """
+        Сворачиваем по мере готовности: acc = reducer(acc, результат куска).
+        on_partial(кусок, результат, acc) - для прогресса; исключение из него
+        останавливает всё и отменяет остальные куски.
+        """
+        acc = initial
+        stream = self.partials(kernel, ranges, window)
+
+        try:
+            async for rng, value in stream:
+
+                acc = reducer(acc, value)
+
+                if on_partial is not None:
+                    on_partial(rng, value, acc)
+
+        finally:
+            await stream.aclose()
+
+        return acc
+
+    def close(self) -> None:
+
+        if self._own_executor and self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self) -> "MapReduce":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,16 +1,63 @@
+import argparse
 import asyncio
-from typing import List, Tuple
+import contextlib
+import csv
+import json
+import ipaddress
+import math
+import multiprocessing
+import multiprocessing.sharedctypes
+import socket
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from urllib.parse import urlsplit
 
 import aiohttp
 from tqdm import tqdm
 
+from scanner_store import ResultStore
+
 URLS_FILE = "urls.txt"
 RESULTS_FILE = "результаты.txt"
-
-#читаем файл
-def read_urls(filename: str) -> List[str]:
-    
-    urls: List[str] = []
+STORE_FILE = "scanner_results.sqlite3"  # все результаты с временем проверки, пишутся по ходу
+JSONL_FILE = "результаты.jsonl"  # то же, что в RESULTS_FILE, но с временем по фазам
+CSV_FILE = "результаты.csv"
+SLOWEST_HOSTS = 5  # сколько самых медленных хостов показать в конце
+
+# "tuned" - свой коннектор: лимит на хост, кэш DNS, keep-alive; "default" - как в aiohttp из коробки
+CONNECTOR_MODE = "tuned"
+LIMIT_PER_HOST = 10
+DNS_CACHE_TTL = 300  # сек
+KEEPALIVE_TIMEOUT = 30  # сек
+
+# сначала HEAD (тело не нужно), а если сервер HEAD не любит - GET
+HEAD_FIRST = True
+HEAD_FALLBACK_STATUSES = {400, 403, 405, 501}
+
+# адаптивная параллельность (AIMD): число из ask_limit - только старт, дальше
+# растём, пока ответы быстрые и без ошибок, и вдвое сбрасываем на таймаутах/ошибках
+ADAPTIVE = True
+MAX_LIMIT = 200  # общий потолок
+LATENCY_TARGET = 3.0  # сек; дольше - считаем, что перегрузили
+BACKOFF_FACTOR = 0.5
+DECREASE_COOLDOWN = 1.0  # сек; пачка ошибок подряд режет лимит один раз
+CONGESTION_STATUSES = {"BAD (429)", "BAD (503)"}
+
+# перед HTTP-запросом резолвим хост: мусорные урлы и несуществующие домены
+# сразу получают ошибку и не занимают лимит до таймаута
+PRE_RESOLVE = True
+RESOLVE_TIMEOUT = 2.0  # сек на один хост
+RESOLVE_CONCURRENCY = 50
+HOST_CACHE_SIZE = 10_000  # сколько последних хостов помним, чтобы не резолвить их урлы заново
+
+# сколько процессов: 1 - один event loop как раньше, больше - урлы делятся между процессами
+PROCESSES = 1
+
+#читаем файл по строчке, целиком в память не грузим
+def read_urls(filename: str) -> Iterator[str]:
     
     with open(filename, "r", encoding="utf-8") as f:
         
@@ -21,9 +68,12 @@ def read_urls(filename: str) -> List[str]:
             if not url or url.startswith("#"):
                 continue
                 
-            urls.append(url)
-            
-    return urls
+            yield url
+
+
+def count_urls(filename: str) -> int:
+    # отдельный проход только ради total у прогресс-бара, память не растёт
+    return sum(1 for _ in read_urls(filename))
 
 
 #ввод
@@ -52,100 +102,783 @@ def ask_limit() -> int:
             print("Нужно целое число, попробуй ещё раз.")
 
 
+def url_problem(url: str) -> Optional[str]:
+    # урл, который даже нет смысла отправлять: не http(s), без хоста, кривой порт или IP
+    
+    try:
+        parts = urlsplit(url)
+        parts.port
+        
+    except ValueError:
+        return "ERROR (invalid URL)"
+
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return "ERROR (invalid URL)"
+
+    host = parts.hostname
+
+    # 256.256.256.256 - не домен, а сломанный IP; резолвер на нём только теряет время
+    if ":" in host or host.replace(".", "").isdigit():
+        
+        try:
+            ipaddress.ip_address(host)
+            
+        except ValueError:
+            return "ERROR (invalid IP)"
+
+    return None
+
+
+async def resolve_host(
+    
+    host: str,
+    timeout: float = RESOLVE_TIMEOUT,
+    executor: Optional[ThreadPoolExecutor] = None,
+    
+) -> Optional[str]:
+    # None - резолвится или не успели узнать, иначе статус ошибки для всех урлов этого хоста
+    
+    try:
+        ipaddress.ip_address(host)
+        return None
+        
+    except ValueError:
+        pass
+
+    loop = asyncio.get_running_loop()
+
+    try:
+        await asyncio.wait_for(
+            loop.run_in_executor(executor, socket.getaddrinfo, host, None, 0, socket.SOCK_STREAM),
+            timeout,
+        )
+        
+    except asyncio.TimeoutError:
+        # медленный резолвер - ещё не мёртвый хост: пусть решает HTTP-проверка
+        return None
+        
+    except OSError:
+        return "ERROR (DNS)"
+
+    return None
+
+
+class HostResolver:
+    """
+    DNS-проверка по ходу скана, а не отдельным проходом по всем урлам: хост
+    резолвим, когда до него дошёл первый урл, и помним ответ в LRU на cache_size
+    хостов - память не растёт с размером входа. Урлы хоста, пришедшие во время
+    резолва, ждут тот же резолв. Для getaddrinfo свой пул на concurrency потоков:
+    в общем пуле loop потоков меньше, и время в его очереди съедало бы timeout.
+    """
+
+    def __init__(
+        self,
+        timeout: float = RESOLVE_TIMEOUT,
+        concurrency: int = RESOLVE_CONCURRENCY,
+        cache_size: int = HOST_CACHE_SIZE,
+    ) -> None:
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self.pending: Dict[str, "asyncio.Task[Optional[str]]"] = {}
+        self.sem = asyncio.Semaphore(concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="resolve")
+        self.resolved = 0
+        self.failed = 0
+
+    async def check(self, host: str) -> Optional[str]:
+        """None - хост резолвится (или не успели узнать), иначе статус ошибки для его урлов."""
+        if host in self.cache:
+            self.cache.move_to_end(host)
+            return self.cache[host]
+
+        task = self.pending.get(host)
+
+        if task is None:
+            task = asyncio.create_task(self._resolve(host))
+            self.pending[host] = task
+
+        # отмена одного воркера не должна отменять резолв для остальных
+        return await asyncio.shield(task)
+
+    async def _resolve(self, host: str) -> Optional[str]:
+        try:
+            async with self.sem:
+                status = await resolve_host(host, self.timeout, self.executor)
+
+        finally:
+            del self.pending[host]
+
+        self.cache[host] = status
+
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        self.resolved += 1
+        if status is not None:
+            self.failed += 1
+
+        return status
+
+    def close(self) -> None:
+        for task in self.pending.values():
+            task.cancel()
+
+        # зависшие по таймауту getaddrinfo не ждём, они досчитаются сами
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def make_connector(limit: int, mode: str) -> Optional[aiohttp.TCPConnector]:
+
+    if mode == "default":
+        return None
+
+    if mode != "tuned":
+        raise ValueError(f"Неизвестный режим коннектора: {mode}")
+
+    return aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=LIMIT_PER_HOST,
+        use_dns_cache=True,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+    )
+
+
+Timing = Dict[str, Optional[float]]
+
+
+def new_timing() -> Timing:
+    # dns и connect копятся (HEAD, потом GET - два запроса), ttfb - у последнего запроса
+    return {"dns": 0.0, "connect": 0.0, "ttfb": None, "total": None}
+
+
+def make_trace_config() -> aiohttp.TraceConfig:
+    """
+    Хуки aiohttp пишут фазы запроса в словарь из trace_request_ctx (new_timing).
+    connect - это TCP вместе с TLS: отдельного хука на рукопожатие в aiohttp нет.
+    Соединение из пула и DNS из кэша дают 0.
+    """
+    trace = aiohttp.TraceConfig()
+
+    def phase(name: str):
+
+        async def start(session, ctx, params) -> None:
+            if ctx.trace_request_ctx is not None:
+                ctx.trace_request_ctx["_" + name] = time.perf_counter()
+
+        async def end(session, ctx, params) -> None:
+            timing = ctx.trace_request_ctx
+            if timing is not None and "_" + name in timing:
+                timing[name] += time.perf_counter() - timing.pop("_" + name)
+
+        return start, end
+
+    dns_start, dns_end = phase("dns")
+    trace.on_dns_resolvehost_start.append(dns_start)
+    trace.on_dns_resolvehost_end.append(dns_end)
+
+    connect_start, connect_end = phase("connect")
+    trace.on_connection_create_start.append(connect_start)
+    trace.on_connection_create_end.append(connect_end)
+
+    async def request_start(session, ctx, params) -> None:
+        if ctx.trace_request_ctx is not None:
+            ctx.trace_request_ctx["_request"] = time.perf_counter()
+
+    # on_request_end приходит, когда получены заголовки ответа - это и есть первый байт
+    async def request_end(session, ctx, params) -> None:
+        timing = ctx.trace_request_ctx
+        if timing is not None and "_request" in timing:
+            timing["ttfb"] = time.perf_counter() - timing.pop("_request")
+
+    trace.on_request_start.append(request_start)
+    trace.on_request_end.append(request_end)
+
+    return trace
+
+
+# только статус, тело не читаем
+async def fetch_status(session: aiohttp.ClientSession, url: str, head_first: bool, timing: Optional[Timing] = None) -> int:
+
+    if head_first:
+        
+        async with session.head(url, allow_redirects=True, trace_request_ctx=timing) as resp:
+            
+            if resp.status not in HEAD_FALLBACK_STATUSES:
+                return resp.status
+
+    async with session.get(url, trace_request_ctx=timing) as resp:
+        
+        # закрываем сразу: тело так и не скачается (соединение при этом не переиспользуется)
+        resp.close()
+        
+        return resp.status
+
+
 async def check_url(
     
     session: aiohttp.ClientSession,
     url: str,
-    sem: asyncio.Semaphore,
     pbar: tqdm,
+    head_first: bool = HEAD_FIRST,
     
-) -> Tuple[str, str]:
+) -> Tuple[str, str, Timing]:
+
+    timing = new_timing()
 
-    async with sem:
+    try:
         
-        try:
-            
-            async with session.get(url) as resp:
-                if 200 <= resp.status < 300:
-                    status = f"OK ({resp.status})"
-                    
-                else:
-                    
-                    status = f"BAD ({resp.status})"
-                    
-        except asyncio.TimeoutError:
-            status = "ERROR (timeout)"
+        code = await fetch_status(session, url, head_first, timing)
+        
+        if 200 <= code < 300:
+            status = f"OK ({code})"
             
-        except aiohttp.ClientError as e:
-            status = f"ERROR ({type(e).__name__})"
+        else:
             
-        except Exception as e:
-            status = f"ERROR ({type(e).__name__})"
+            status = f"BAD ({code})"
+                
+    except asyncio.TimeoutError:
+        status = "ERROR (timeout)"
+        
+    except aiohttp.ClientError as e:
+        status = f"ERROR ({type(e).__name__})"
+        
+    except Exception as e:
+        status = f"ERROR ({type(e).__name__})"
 
     pbar.update(1) 
+
+    # недоделанные фазы (запрос упал посередине) в отчёт не пойдут
+    for key in [k for k in timing if k.startswith("_")]:
+        del timing[key]
     
-    return url, status
+    return url, status, timing
+
+
+
+class AdaptiveLimiter:
+    """
+    Сколько проверок можно делать одновременно - всего и на один хост.
+    Пока всё хорошо, лимит растёт: сначала на 1 за каждый успех (быстрый
+    старт), после первого сброса - на 1 за "окно" из limit успехов. На
+    таймауте, ошибке соединения, 429/503 или слишком медленном ответе
+    лимит уменьшается в BACKOFF_FACTOR раз.
+    """
+
+    def __init__(self, initial: int, max_limit: int, per_host: int, min_limit: int = 1) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.per_host_limit = per_host
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+
+        self.slow_start = True
+        self.in_flight = 0
+        self.per_host: Dict[str, int] = {}
+        self._cond = asyncio.Condition()
+        self._last_decrease = 0.0
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    def _free(self, host: str) -> bool:
+        return self.in_flight < int(self.limit) and self.per_host.get(host, 0) < self.per_host_limit
+
+    async def acquire(self, host: str) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._free(host))
+            self.in_flight += 1
+            self.per_host[host] = self.per_host.get(host, 0) + 1
+
+    async def release(self, host: str, latency: float, congested: bool) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            self.per_host[host] -= 1
 
+            if not self.per_host[host]:
+                del self.per_host[host]
 
+            if congested or latency > LATENCY_TARGET:
+                self._decrease()
 
-async def main(limit: int):
+            elif self.slow_start:
+                self.limit = min(self.max_limit, self.limit + 1)
+
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            self._cond.notify_all()
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+
+        self._last_decrease = now
+        self.slow_start = False
+        self.limit = max(float(self.min_limit), self.limit * BACKOFF_FACTOR)
+
+
+def is_congestion(status: str) -> bool:
+
+    if status in CONGESTION_STATUSES or status == "ERROR (timeout)":
+        return True
+
+    # несуществующий домен - это не перегрузка, лимит из-за него не режем
+    if "DNS" in status:
+        return False
+
+    return status.startswith("ERROR")
+
+
+ResultSink = Callable[[int, str, str, Timing], None]
+
+
+# воркер берёт урлы из очереди, пока не получит None, и сразу отдаёт результат в on_result
+async def worker(
     
-    urls = read_urls(URLS_FILE)
+    session: aiohttp.ClientSession,
+    queue: "asyncio.Queue[Tuple[int, str] | None]",
+    on_result: ResultSink,
+    counts: Dict[str, int],
+    pbar: tqdm,
+    head_first: bool,
+    limiter: AdaptiveLimiter,
+    resolver: Optional[HostResolver],
     
-    if not urls:
+) -> None:
 
-        print(f"В файле {URLS_FILE} нет урлов, нечего проверять.")
-        return
+    while True:
+        
+        item = await queue.get()
+        
+        if item is None:
+            return
 
-    print(f"Нашёл {len(urls)} URL, буду проверять по {limit} штук одновременно.\n")
+        index, url = item
 
+        # кривые урлы и нерезолвящиеся хосты - без запроса и не занимая лимит
+        problem = url_problem(url)
+        host = "" if problem else urlsplit(url).hostname
 
-    timeout = aiohttp.ClientTimeout(total=10)
+        if problem is None and resolver is not None:
+            problem = await resolver.check(host)
+
+        if problem is not None:
 
-    sem = asyncio.Semaphore(limit)
+            pbar.update(1)
+            on_result(index, url, problem, {"dns": None, "connect": None, "ttfb": None, "total": 0.0})
+            counts["bad"] += 1
+            continue
 
-    async with aiohttp.ClientSession(timeout=timeout) as session:
+        await limiter.acquire(host)
         
-        with tqdm(total=len(urls), desc="Проверяем сайты", ncols=80) as pbar:
-            tasks = [
-                asyncio.create_task(check_url(session, url, sem, pbar))
-                for url in urls
-            ]
+        t0 = time.perf_counter()
+        url, status, timing = await check_url(session, url, pbar, head_first)
+        latency = time.perf_counter() - t0
+        timing["total"] = latency
+
+        await limiter.release(host, latency, is_congestion(status))
+
+        pbar.set_postfix_str(f"limit={limiter.current}", refresh=False)
+
+        on_result(index, url, status, timing)
+
+        if status.startswith("OK"):
+            counts["ok"] += 1
             
-            results = await asyncio.gather(*tasks)
+        else:
+            
+            counts["bad"] += 1
+
+
+def write_lines(out: TextIO) -> ResultSink:
+    # результаты в файл в порядке готовности
+    
+    def on_result(index: int, url: str, status: str, timing: Timing) -> None:
+        out.write(f"{url} - {status}\n")
+
+    return on_result
+
+
+def pending_urls(urls: Iterable[str], store: ResultStore, max_age: Optional[float]) -> Iterator[str]:
+    # max_age=None - проверяем всё заново, иначе пропускаем тех, кого проверяли недавно
+    
+    if max_age is None:
+        yield from urls
+        return
+
+    now = time.time()
+
+    for url in urls:
+        if not store.is_fresh(url, max_age, now):
+            yield url
 
 
-    ok_count = 0
+REPORT_FIELDS = ["url", "status", "total", "dns", "connect", "ttfb", "checked_at"]
+PHASES = {"dns": "dns", "connect": "connect", "ttfb": "ttfb", "total": "latency"}  # фаза -> колонка в базе
+PERCENTILES = (0.50, 0.90, 0.99)
 
-    bad_count = 0
 
-    with open(RESULTS_FILE, "w", encoding="utf-8") as f:
+def _seconds(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 4)
+
+
+def export_results(
+    
+    urls_file: str,
+    results_file: str,
+    store: ResultStore,
+    jsonl_file: Optional[str] = None,
+    csv_file: Optional[str] = None,
+    
+) -> Dict[str, object]:
+    """
+    Отчёты собираем из базы в порядке urls.txt, вместе с пропущенными:
+    текст как раньше, плюс JSON Lines и CSV со временем по фазам (сек).
+    Сводку (перцентили по фазам и медленные хосты) считает сама SQLite по
+    всей базе, так что память не растёт с числом урлов.
+    """
+    with contextlib.ExitStack() as stack:
         
-        for url, status in results:
+        out = stack.enter_context(open(results_file, "w", encoding="utf-8"))
+        jsonl = stack.enter_context(open(jsonl_file, "w", encoding="utf-8")) if jsonl_file else None
+        table = None
+
+        if csv_file:
+            table = csv.DictWriter(stack.enter_context(open(csv_file, "w", encoding="utf-8", newline="")), REPORT_FIELDS)
+            table.writeheader()
+
+        for url in read_urls(urls_file):
             
-            f.write(f"{url} - {status}\n")
+            row = store.get(url)
             
+            if row is None:
+                continue
+
+            out.write(f"{url} - {row['status']}\n")
+
+            record = {
+                "url": url,
+                "status": row["status"],
+                "total": _seconds(row["latency"]),
+                "dns": _seconds(row["dns"]),
+                "connect": _seconds(row["connect"]),
+                "ttfb": _seconds(row["ttfb"]),
+                "checked_at": datetime.fromtimestamp(row["checked_at"], timezone.utc).isoformat(timespec="seconds"),
+            }
+
+            if jsonl is not None:
+                jsonl.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            if table is not None:
+                table.writerow(record)
+
+    return {
+        "phases": {phase: store.percentiles(column, PERCENTILES) for phase, column in PHASES.items()},
+        "hosts": store.slowest_hosts(SLOWEST_HOSTS),
+    }
+
+
+def print_summary(summary: Dict[str, object]) -> None:
+    
+    phases = summary["phases"]
+    
+    if not phases["total"]:
+        return
+
+    print("\nВремя, мс        p50      p90      p99")
+
+    for phase, values in phases.items():
+        
+        if not values:
+            continue
+
+        p50, p90, p99 = (value * 1000 for value in values)
+        print(f"  {phase:9} {p50:8.1f} {p90:8.1f} {p99:8.1f}")
+
+    print("\nСамые медленные хосты (среднее время):")
+
+    for host in summary["hosts"]:
+        print(f"  {str(host['host']):40} {host['latency'] * 1000:8.1f} мс  ({host['urls']} урл.)")
+
+
+# сама проверка: урлы из любого итератора, каждый результат - в on_result(номер, url, статус, время)
+async def scan(
+    
+    urls: Iterable[str],
+    total: int,
+    limit: int,
+    on_result: ResultSink,
+    connector_mode: str = CONNECTOR_MODE,
+    head_first: bool = HEAD_FIRST,
+    progress: bool = True,
+    adaptive: bool = ADAPTIVE,
+    pre_resolve: bool = PRE_RESOLVE,
+    
+) -> Dict[str, int]:
+
+    timeout = aiohttp.ClientTimeout(total=10)
+
+    # без адаптации лимит просто фиксированный: min = max = limit
+    max_limit = max(MAX_LIMIT, limit) if adaptive else limit
+    limiter = AdaptiveLimiter(
+        limit,
+        max_limit,
+        LIMIT_PER_HOST if connector_mode == "tuned" else max_limit,
+        min_limit=1 if adaptive else limit,
+    )
+
+    # очередь ограничена: читаем файл не быстрее, чем воркеры успевают проверять
+    queue: "asyncio.Queue[Tuple[int, str] | None]" = asyncio.Queue(maxsize=max_limit * 2)
+
+    counts = {"ok": 0, "bad": 0}
+
+    connector = make_connector(max_limit, connector_mode)
+    resolver = HostResolver() if pre_resolve else None
+
+    try:
+        async with aiohttp.ClientSession(
+            timeout=timeout, connector=connector, trace_configs=[make_trace_config()]
+        ) as session:
+
+            with tqdm(total=total, desc="Проверяем сайты", ncols=80, disable=not progress) as pbar:
+                workers = [
+                    asyncio.create_task(
+                        worker(session, queue, on_result, counts, pbar, head_first, limiter, resolver)
+                    )
+                    for _ in range(max_limit)
+                ]
+
+                for item in enumerate(urls):
+                    await queue.put(item)
+
+                for _ in workers:
+                    await queue.put(None)
+
+                await asyncio.gather(*workers)
+
+    finally:
+        if resolver is not None:
+            resolver.close()
+
+    return counts
+
+
+def _scan_shard(
+    
+    urls_file: str,
+    store_file: str,
+    shard: int,
+    shards: int,
+    limit: int,
+    max_age: Optional[float],
+    done: "multiprocessing.sharedctypes.Synchronized[int]",
+    ok: "multiprocessing.sharedctypes.Synchronized[int]",
+    
+) -> None:
+    # в отдельном процессе: свой event loop, своя сессия, свой кусок урлов (каждый shards-й)
+    
+    store = ResultStore(store_file)
+
+    try:
+        shard_urls = (url for i, url in enumerate(read_urls(urls_file)) if i % shards == shard)
+        urls = pending_urls(shard_urls, store, max_age)
+
+        def on_result(index: int, url: str, status: str, timing: Timing) -> None:
+            store.add(url, status, timing)
+
+            with done.get_lock():
+                done.value += 1
+
             if status.startswith("OK"):
-                ok_count += 1
-                
-            else:
-                
-                bad_count += 1
+                with ok.get_lock():
+                    ok.value += 1
+
+        asyncio.run(scan(urls, 0, limit, on_result, progress=False))
+
+    finally:
+        # и при Ctrl+C: всё, что успели проверить, остаётся в базе
+        store.close()
+
+
+def scan_sharded(
+    
+    urls_file: str,
+    store_file: str,
+    total: int,
+    limit: int,
+    processes: int,
+    max_age: Optional[float] = None,
+    progress: bool = True,
+    
+) -> Dict[str, int]:
+    """
+    Делим урлы на processes процессов (урл номер i - в процесс i % processes),
+    в каждом свой event loop и своя aiohttp-сессия, limit и потолки лимитера -
+    на процесс. Результаты все пишут в одну базу store_file, прогресс общий.
+    """
+    done = multiprocessing.Value("q", 0)
+    ok = multiprocessing.Value("q", 0)
+
+    workers = [
+        multiprocessing.Process(
+            target=_scan_shard,
+            args=(urls_file, store_file, k, processes, limit, max_age, done, ok),
+        )
+        for k in range(processes)
+    ]
+
+    for p in workers:
+        p.start()
+
+    with tqdm(total=total, desc="Проверяем сайты", ncols=80, disable=not progress) as pbar:
+        
+        while any(p.is_alive() for p in workers):
+            time.sleep(0.2)
+            pbar.update(done.value - pbar.n)
+
+        pbar.update(done.value - pbar.n)
+
+    for p in workers:
+        p.join()
+
+    failed = [k for k, p in enumerate(workers) if p.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"Процессы {failed} завершились с ошибкой")
+
+    return {"ok": ok.value, "bad": done.value - ok.value}
+
+
+async def main(
+    
+    limit: int,
+    processes: int = PROCESSES,
+    max_age: Optional[float] = None,
+    urls_file: str = URLS_FILE,
+    results_file: str = RESULTS_FILE,
+    store_file: str = STORE_FILE,
+    jsonl_file: Optional[str] = JSONL_FILE,
+    csv_file: Optional[str] = CSV_FILE,
+    
+):
+    
+    total = count_urls(urls_file)
+    
+    if not total:
+
+        print(f"В файле {urls_file} нет урлов, нечего проверять.")
+        return
 
+    store = ResultStore(store_file)
+    counts = {"ok": 0, "bad": 0}
+
+    try:
+        todo = sum(1 for _ in pending_urls(read_urls(urls_file), store, max_age))
+
+        if todo < total:
+            print(f"Нашёл {total} URL, {total - todo} уже проверены раньше, их пропускаю.")
+
+        if not todo:
+            print("Проверять нечего, только соберу отчёт.")
+
+        elif ADAPTIVE:
+            print(f"Проверяю {todo} URL, начну с {limit} одновременно, дальше подстроюсь (до {MAX_LIMIT}).\n")
+            
+        else:
+            print(f"Проверяю {todo} URL по {limit} штук одновременно.\n")
+
+        if todo and processes > 1:
+            
+            print(f"Проверяем в {processes} процессах.\n")
+            store.flush()
+            counts = scan_sharded(urls_file, store_file, todo, limit, processes, max_age)
+
+        elif todo:
+
+            def on_result(index: int, url: str, status: str, timing: Timing) -> None:
+                store.add(url, status, timing)
+            
+            urls = pending_urls(read_urls(urls_file), store, max_age)
+            counts = await scan(urls, todo, limit, on_result)
+
+        store.flush()
+        summary = export_results(urls_file, results_file, store, jsonl_file, csv_file)
+
+    except (KeyboardInterrupt, asyncio.CancelledError):
+
+        print(f"\nПрервано. Проверенное сохранено в {store_file}, продолжить: --resume")
+        raise
+
+    finally:
+        store.close()
 
 
 
     print("\nГотово.")
-    print(f"Всего урлов: {len(results)}")
-    print(f"Доступны : {ok_count}")
-    print(f"Недоступны с ошибками: {bad_count}")
+    print(f"Проверено сейчас: {counts['ok'] + counts['bad']}")
+    print(f"Доступны : {counts['ok']}")
+    print(f"Недоступны с ошибками: {counts['bad']}")
 
+    print_summary(summary)
+
+    print(f"\nОтчёт: {', '.join(path for path in (results_file, jsonl_file, csv_file) if path)}")
+
+
+
+def parse_args() -> argparse.Namespace:
+    
+    parser = argparse.ArgumentParser(description="Проверка доступности сайтов из urls.txt")
+    parser.add_argument("--limit", type=int, help="сколько запросов одновременно (без него - спросим)")
+    parser.add_argument("--processes", type=int, default=PROCESSES, help="сколько процессов")
+    parser.add_argument("--urls", default=URLS_FILE, help="файл со списком урлов")
+    parser.add_argument("--results", default=RESULTS_FILE, help="текстовый отчёт")
+    parser.add_argument("--jsonl", default=JSONL_FILE, help="отчёт в JSON Lines ('' - не писать)")
+    parser.add_argument("--csv", default=CSV_FILE, help="отчёт в CSV ('' - не писать)")
+    parser.add_argument("--store", default=STORE_FILE, help="база с результатами")
+    parser.add_argument("--resume", action="store_true", help="пропустить урлы, которые уже есть в базе")
+    parser.add_argument(
+        "--max-age", type=float, metavar="СЕК",
+        help="перепроверить только урлы, проверенные раньше, чем столько секунд назад",
+    )
+    
+    args = parser.parse_args()
+
+    if args.limit is not None and args.limit <= 0:
+        parser.error("--limit должен быть положительным")
+
+    if args.processes <= 0:
+        parser.error("--processes должен быть положительным")
+
+    return args
 
 
 if __name__ == "__main__":
+
+    args = parse_args()
+
+    # --max-age сам по себе тоже продолжение: свежие пропускаем, старые перепроверяем
+    max_age = args.max_age if args.max_age is not None else (math.inf if args.resume else None)
+    
+    limit = args.limit if args.limit is not None else ask_limit()
     
-    limit = ask_limit()
-    asyncio.run(main(limit))
+    try:
+        asyncio.run(main(
+            limit,
+            processes=args.processes,
+            max_age=max_age,
+            urls_file=args.urls,
+            results_file=args.results,
+            store_file=args.store,
+            jsonl_file=args.jsonl or None,
+            csv_file=args.csv or None,
+        ))
+        
+    except KeyboardInterrupt:
+        pass
 
 #тут даже не знаю что комментировать
 # расписал кейсы ввода подробно
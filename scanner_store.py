@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+# Результаты scanner по каждому урлу: статус, время по фазам и когда проверяли.
+# Лежат в SQLite и пишутся по ходу проверки, поэтому прерванный прогон можно
+# продолжить, а повторный - проверять только то, что устарело.
+
+CHECKPOINT_ROWS = 500  # сбрасываем на диск каждые столько результатов...
+CHECKPOINT_INTERVAL = 1.0  # ...или не реже, чем раз в столько секунд
+
+TIMING_COLUMNS = ("latency", "dns", "connect", "ttfb")
+
+# в сводку по времени идут только урлы, до которых дошёл запрос: у отбракованных
+# заранее (кривой урл, хост не резолвится) dns = NULL
+REQUESTED = "dns IS NOT NULL AND latency IS NOT NULL"
+
+
+def _url_host(url: str) -> Optional[str]:
+    return urlsplit(url).hostname
+
+
+class ResultStore:
+    """
+    Таблица results: url (ключ), status, latency (всё время, сек), dns, connect,
+    ttfb (фазы, сек; NULL - фазы не было), checked_at (unix time).
+    Новые результаты копятся в буфере и коммитятся пачкой - это и есть
+    чекпоинт: после падения теряется максимум последняя пачка. База в WAL,
+    так что в неё могут писать сразу несколько процессов scanner.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._buffer: List[tuple] = []
+        self._last_flush = time.monotonic()
+
+        self._db = sqlite3.connect(db_path, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.create_function("url_host", 1, _url_host, deterministic=True)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                url TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                latency REAL,
+                checked_at REAL NOT NULL
+            )
+            """
+        )
+
+        # базы от прошлых версий: фаз там ещё не было
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(results)")}
+
+        for column in ("dns", "connect", "ttfb"):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE results ADD COLUMN {column} REAL")
+
+        self._db.commit()
+
+    def add(self, url: str, status: str, timing: Dict[str, Optional[float]]) -> None:
+        """timing - {"dns", "connect", "ttfb", "total"} из scanner."""
+        self._buffer.append(
+            (url, status, timing["total"], timing["dns"], timing["connect"], timing["ttfb"], time.time())
+        )
+
+        if len(self._buffer) >= CHECKPOINT_ROWS or time.monotonic() - self._last_flush >= CHECKPOINT_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+
+        if not self._buffer:
+            return
+
+        self._db.executemany(
+            "INSERT INTO results (url, status, latency, dns, connect, ttfb, checked_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (url) DO UPDATE SET "
+            "status = excluded.status, latency = excluded.latency, dns = excluded.dns, "
+            "connect = excluded.connect, ttfb = excluded.ttfb, checked_at = excluded.checked_at",
+            self._buffer,
+        )
+        self._db.commit()
+        self._buffer.clear()
+
+    def get(self, url: str) -> Optional[sqlite3.Row]:
+        """Последняя проверка (status, latency, dns, connect, ttfb, checked_at) или None."""
+        return self._db.execute(
+            "SELECT status, latency, dns, connect, ttfb, checked_at FROM results WHERE url = ?", (url,)
+        ).fetchone()
+
+    def is_fresh(self, url: str, max_age: float, now: Optional[float] = None) -> bool:
+        """Проверяли не раньше, чем max_age секунд назад (float("inf") - проверяли хоть когда-то)."""
+        row = self._db.execute("SELECT checked_at FROM results WHERE url = ?", (url,)).fetchone()
+
+        if row is None:
+            return False
+
+        return (now if now is not None else time.time()) - row[0] <= max_age
+
+    def percentiles(self, column: str, ps: Iterable[float]) -> List[float]:
+        """
+        Перцентили column (из TIMING_COLUMNS, сек) по урлам, до которых дошёл
+        запрос. Сортирует SQLite, мы берём по строке на смещении - в память
+        значения не выгружаются. Значений нет - пустой список.
+        """
+        if column not in TIMING_COLUMNS:
+            raise ValueError(f"Неизвестная колонка: {column}")
+
+        self.flush()
+        where = f"{REQUESTED} AND {column} IS NOT NULL"
+        n = self._db.execute(f"SELECT count(*) FROM results WHERE {where}").fetchone()[0]
+
+        if not n:
+            return []
+
+        return [
+            self._db.execute(
+                f"SELECT {column} FROM results WHERE {where} ORDER BY {column} LIMIT 1 OFFSET ?",
+                (min(n - 1, int(p * n)),),
+            ).fetchone()[0]
+            for p in ps
+        ]
+
+    def slowest_hosts(self, limit: int) -> List[sqlite3.Row]:
+        """limit хостов с самым большим средним latency: (host, latency, urls)."""
+        self.flush()
+
+        return self._db.execute(
+            f"SELECT url_host(url) AS host, avg(latency) AS latency, count(*) AS urls FROM results "
+            f"WHERE {REQUESTED} GROUP BY host ORDER BY latency DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
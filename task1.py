@@ -1,11 +1,31 @@
+import argparse
 import asyncio
+import json
+import functools
+import math
+import operator
+import platform
+import statistics
+import subprocess
 import time
 import os
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List
+
+from mapreduce import MapReduce
+
+try:
+    import numpy as np
+except ImportError:  # без numpy просто не будет движка "numpy"
+    np = None
 
 # До какого числа считаем сумму квадратов
 N = 1_000_000
 
+NUMPY_CHUNK = 1 << 20  # сколько чисел за раз кладём в массив
+INT64_MAX = 2 ** 63 - 1
+
 
 
 def sum_of_squares_range(start: int, end: int) -> int:
@@ -18,6 +38,69 @@ def sum_of_squares_formula(n: int) -> int:
     return n * (n + 1) * (2 * n + 1) // 6
 
 
+# тот же отрезок, но по формуле: сумма до end минус сумма до start - 1
+def sum_of_squares_closed(start: int, end: int) -> int:
+
+    if end < start:
+        return 0
+
+    return sum_of_squares_formula(end) - sum_of_squares_formula(start - 1)
+
+
+def exact_sum(values) -> int:
+    # сумма неотрицательного int64-массива без переполнения: отдельно старшие и младшие
+    # 32 бита каждого числа, на массиве до 2^31 элементов обе суммы влезают в int64
+    return (int((values >> 32).sum()) << 32) + int((values & 0xFFFFFFFF).sum())
+
+
+def sum_of_squares_numpy(start: int, end: int) -> int:
+
+    total = 0
+    i = start
+
+    while i <= end:
+
+        hi = min(end, i + NUMPY_CHUNK - 1)
+
+        # квадрат уже не влезает в int64 - дальше считаем обычными int
+        if hi * hi > INT64_MAX:
+
+            total += sum_of_squares_range(i, end)
+            break
+
+        chunk = np.arange(i, hi + 1, dtype=np.int64)
+
+        if (hi - i + 1) * hi * hi <= INT64_MAX:
+            total += int(chunk @ chunk)  # в int Python, дальше складываем без переполнения
+
+        else:
+            total += exact_sum(chunk * chunk)
+
+        i = hi + 1
+
+    return total
+
+
+# движки считают одно и то же на отрезке [start, end]; все на уровне модуля, чтобы уходили в процессы
+ENGINES = {
+    "loop": sum_of_squares_range,
+    "closed": sum_of_squares_closed,
+}
+
+if np is not None:
+    ENGINES["numpy"] = sum_of_squares_numpy
+
+MODES = ("sync", "threads", "processes", "warm", "shm")
+
+SLOT_BYTES = 16  # частичная сумма в shared memory: 128-битное целое, в int64 сумма квадратов не влезает
+
+# для "warm": чанк должен считаться примерно столько, чтобы пересылка была копейками
+TARGET_CHUNK_SECONDS = 0.01
+INITIAL_CHUNK = 10_000  # пока ничего не измерили
+MIN_CHUNK = 1_000
+TUNER_ALPHA = 0.3  # вес нового замера в скользящем среднем
+
+
 def split_range(n: int, chunks: int):
 
     if chunks <= 0:
@@ -41,103 +124,490 @@ def split_range(n: int, chunks: int):
     return ranges
 
 #синхрон
-async def run_sync():
+async def run_sync(engine: str = "loop"):
+
+    kernel = ENGINES[engine]
 
     t0 = time.perf_counter()
 
-    result = sum_of_squares_range(1, N)
+    result = kernel(1, N)
 
     dt = time.perf_counter() - t0
 
     return result, dt
 
 
-#с потоками
-async def run_threads(num_workers: int):
+def _warm() -> int:
+    return os.getpid()
 
-    ranges = split_range(N, num_workers)
-    loop = asyncio.get_running_loop()
+
+# пул создаём заранее и ждём, пока поднимутся все воркеры: это и есть "запуск пула"
+def start_pool(kind: str, num_workers: int):
+
+    executor_cls = ThreadPoolExecutor if kind == "threads" else ProcessPoolExecutor
+
+    # трекер shared memory поднимаем до fork, чтобы воркеры делили его с нами (см. _attach)
+    if kind != "threads":
+        resource_tracker.ensure_running()
 
     t0 = time.perf_counter()
 
-    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+    executor = executor_cls(max_workers=num_workers)
 
-        tasks = [
-            loop.run_in_executor(executor, sum_of_squares_range, start, end)
-            for (start, end) in ranges
-        ]
+    # пока свободных воркеров нет, каждый submit поднимает новый - так стартуют все num_workers
+    for future in [executor.submit(_warm) for _ in range(num_workers)]:
+        future.result()
 
-        partial_results = await asyncio.gather(*tasks)
+    return executor, time.perf_counter() - t0
+
+
+# по чанку на воркер, сумма складывается по мере готовности
+async def _run_pool(backend: str, num_workers: int, engine: str, executor):
+
+    ranges = split_range(N, num_workers)
+
+    t0 = time.perf_counter()
+
+    with MapReduce(backend, num_workers, executor) as mapreduce:
+        result = await mapreduce.reduce(ENGINES[engine], ranges, operator.add, 0)
 
-    result = sum(partial_results)
     dt = time.perf_counter() - t0
 
     return result, dt, num_workers
 
 
+#с потоками
+# executor=None - пул создаётся внутри и его запуск входит во время, как раньше
+async def run_threads(num_workers: int, engine: str = "loop", executor=None):
+
+    return await _run_pool("thread", num_workers, engine, executor)
+
+
 #с процессами
-async def run_processes(num_workers: int):
+async def run_processes(num_workers: int, engine: str = "loop", executor=None):
+
+    return await _run_pool("process", num_workers, engine, executor)
+
+
+class ChunkTuner:
+    """
+    Размер чанка по измеренной скорости ядра: держим скользящее среднее
+    секунд на одно число для каждого движка и режем так, чтобы чанк шёл
+    TARGET_CHUNK_SECONDS. К концу диапазона чанки мельчают (не больше
+    остатка / (2 * воркеров)), чтобы в хвосте никто не считал один.
+    """
+
+    def __init__(self, target: float = TARGET_CHUNK_SECONDS, initial: int = INITIAL_CHUNK, min_chunk: int = MIN_CHUNK):
+        self.target = target
+        self.initial = initial
+        self.min_chunk = min_chunk
+        self.per_item: Dict[str, float] = {}
+
+    def size(self, engine: str, remaining: int, workers: int) -> int:
+
+        per_item = self.per_item.get(engine)
+
+        if per_item is None:
+            size = self.initial
+
+        elif per_item <= 0:
+            size = remaining  # ядру размер не важен (closed), ограничит только хвост
+
+        else:
+            size = int(self.target / per_item)
+
+        tail = math.ceil(remaining / (2 * workers))
+
+        return max(1, min(remaining, max(self.min_chunk, min(size, tail))))
+
+    def observe(self, engine: str, items: int, seconds: float) -> None:
+
+        per_item = seconds / items
+        old = self.per_item.get(engine)
+
+        self.per_item[engine] = per_item if old is None else old + TUNER_ALPHA * (per_item - old)
+
+
+class WarmPool:
+    """
+    Один пул процессов на все прогоны: поднимаем при первом запросе и
+    держим, пока не попросят другое число воркеров или не закроют.
+    """
+
+    def __init__(self):
+        self.executor = None
+        self.workers = 0
+
+    def get(self, num_workers: int):
+        # вернёт (пул, сколько секунд ушло на запуск; 0 - был уже тёплый)
+
+        if self.executor is not None and self.workers == num_workers:
+            return self.executor, 0.0
+
+        self.close()
+
+        self.executor, startup = start_pool("processes", num_workers)
+        self.workers = num_workers
+
+        return self.executor, startup
+
+    def close(self) -> None:
+
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+            self.workers = 0
+
+
+warm_pool = WarmPool()
+chunk_tuner = ChunkTuner()
+
+
+# в воркере: считаем чанк и сами меряем время ядра, без пересылки
+def _timed_chunk(engine: str, start: int, end: int):
+
+    t0 = time.perf_counter()
+    result = ENGINES[engine](start, end)
+
+    return result, time.perf_counter() - t0
+
+
+#с тёплым пулом и мелкими чанками
+async def run_warm_processes(num_workers: int, engine: str = "loop", executor=None):
+    """
+    Чанков много больше, чем воркеров, и раздаются они по мере освобождения:
+    в полёте держим 2 на воркер, следующий размер берём у chunk_tuner.
+    Суммируем по мере готовности, а не после gather.
+    """
+    if executor is None:
+        executor, _ = warm_pool.get(num_workers)
+
+    # ленивые чанки: MapReduce берёт следующий, только когда освободилось место,
+    # так что размер уже учитывает замеры пришедших
+    def ranges():
+
+        next_start = 1
+
+        while next_start <= N:
+
+            size = chunk_tuner.size(engine, N - next_start + 1, num_workers)
+            end = min(N, next_start + size - 1)
+
+            yield next_start, end
+            next_start = end + 1
+
+    def on_partial(rng, value, acc) -> None:
+        chunk_tuner.observe(engine, rng[1] - rng[0] + 1, value[1])
+
+    t0 = time.perf_counter()
+
+    with MapReduce("process", num_workers, executor) as mapreduce:
+        result = await mapreduce.reduce(
+            functools.partial(_timed_chunk, engine),
+            ranges(),
+            lambda acc, value: acc + value[0],
+            0,
+            on_partial,
+        )
+
+    dt = time.perf_counter() - t0
+    return result, dt, num_workers
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+
+    except TypeError:
+        # до 3.13 подключение тоже регистрирует сегмент в resource_tracker. Но трекер
+        # у воркеров общий с родителем (spawn/forkserver получают его fd, а перед fork
+        # его запускает start_pool), так что повтор ничего не меняет. Снимать запись
+        # нельзя: она родительская, и его unlink() потом упадёт в трекере
+        return shared_memory.SharedMemory(name=name)
+
+
+# в воркере: частичную сумму не возвращаем через pipe, а кладём в свой слот.
+# Чанки из split_range идут с шагом step, так что номер слота - по началу куска
+def _shm_chunk_sum(shm_name: str, engine: str, step: int, start: int, end: int) -> None:
+
+    shm = _attach(shm_name)
+    slot = (start - 1) // step
+
+    try:
+        shm.buf[slot * SLOT_BYTES:(slot + 1) * SLOT_BYTES] = ENGINES[engine](start, end).to_bytes(SLOT_BYTES, "little", signed=True)
+
+    finally:
+        shm.close()
+
+
+#с процессами, частичные суммы через shared memory
+async def run_shm_processes(num_workers: int, engine: str = "loop", executor=None):
+    """
+    Как run_processes, но воркер пишет частичную сумму в слот общего буфера
+    по номеру чанка, а обратно по pipe идёт только None. Родитель складывает
+    слоты прямо из буфера, ничего не копируя.
+    """
+    chunks = max(1, min(num_workers, N))  # чанков не больше чисел, иначе слоты совпадут
+    ranges = split_range(N, chunks)
+
+    t0 = time.perf_counter()
+
+    shm = shared_memory.SharedMemory(create=True, size=len(ranges) * SLOT_BYTES)
+
+    try:
+        with MapReduce("process", num_workers, executor) as mapreduce:
+            kernel = functools.partial(_shm_chunk_sum, shm.name, engine, N // chunks)
+
+            async for _ in mapreduce.partials(kernel, ranges):
+                pass
+
+        result = sum(
+            int.from_bytes(shm.buf[slot * SLOT_BYTES:(slot + 1) * SLOT_BYTES], "little", signed=True)
+            for slot in range(len(ranges))
+        )
+
+    finally:
+        shm.close()
+        shm.unlink()
+
+    dt = time.perf_counter() - t0
+    return result, dt, num_workers
+
+
+# ядро с массивом на выходе: сами квадраты, а не их сумма
+def squares_array(start: int, end: int):
+
+    chunk = np.arange(start, end + 1, dtype=np.int64)
+
+    return chunk * chunk
+
+
+def _shm_squares(shm_name: str, n: int, start: int, end: int) -> None:
+
+    shm = _attach(shm_name)
+
+    try:
+        out = np.ndarray((n,), dtype=np.int64, buffer=shm.buf)
+        chunk = np.arange(start, end + 1, dtype=np.int64)
+        np.multiply(chunk, chunk, out=out[start - 1:end])
+
+        # пока жив view на буфер, close() не даст закрыть сегмент
+        del out
+
+    finally:
+        shm.close()
+
+
+async def squares_pickle(num_workers: int, executor=None):
+    # массивы квадратов возвращаются из воркеров через pipe; родитель их сшивает
+    # в один (как понадобилось бы любому, кому нужен весь массив) и суммирует
 
     ranges = split_range(N, num_workers)
 
-    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+
+    with MapReduce("process", num_workers, executor) as mapreduce:
+        parts = [(rng, value) async for rng, value in mapreduce.partials(squares_array, ranges)]
+
+    parts.sort(key=lambda part: part[0])
+    squares = np.concatenate([value for _, value in parts])
+    result = exact_sum(squares)
+
+    dt = time.perf_counter() - t0
+    return result, dt, num_workers
+
+
+async def squares_shm(num_workers: int, executor=None):
+    # воркеры пишут квадраты сразу на свои места в общем массиве, родитель суммирует его на месте
+
+    ranges = split_range(N, num_workers)
 
     t0 = time.perf_counter()
 
-    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+    shm = shared_memory.SharedMemory(create=True, size=N * 8)
+
+    try:
+        with MapReduce("process", num_workers, executor) as mapreduce:
 
-        tasks = [
-            loop.run_in_executor(executor, sum_of_squares_range, start, end)
-            for (start, end) in ranges
-        ]
-        partial_results = await asyncio.gather(*tasks)
+            async for _ in mapreduce.partials(functools.partial(_shm_squares, shm.name, N), ranges):
+                pass
+
+        squares = np.ndarray((N,), dtype=np.int64, buffer=shm.buf)
+        result = exact_sum(squares)
+        del squares
+
+    finally:
+        shm.close()
+        shm.unlink()
 
-    result = sum(partial_results)
     dt = time.perf_counter() - t0
     return result, dt, num_workers
 
 
-async def main():
+def describe(times: List[float]) -> Dict[str, float]:
+
+    ordered = sorted(times)
+
+    return {
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)],
+        "stddev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "runs": len(ordered),
+    }
+
+
+async def measure(engine: str, mode: str, workers: int, warmup: int, repeat: int) -> dict:
+    """
+    Один вариант: warmup прогонов в корзину, потом repeat с замером.
+    Для потоков и процессов на каждый прогон свой пул: его запуск меряем
+    отдельно от счёта, а закрытие не меряем вовсе. "warm" берёт общий warm_pool.
+    """
     expected = sum_of_squares_formula(N)
-    
-    # Синхрон
-    sync_result, sync_time = await run_sync()
+    startup, compute = [], []
+    correct = True
+
+    for i in range(warmup + repeat):
+
+        if mode == "sync":
+
+            result, dt = await run_sync(engine)
+            start_dt = 0.0
+
+        elif mode == "warm":
+
+            # пул общий: запуск платит только первый прогон, закрываем в конце main
+            executor, start_dt = warm_pool.get(workers)
+            result, dt, _ = await run_warm_processes(workers, engine, executor)
+
+        else:
+
+            executor, start_dt = start_pool(mode, workers)
+
+            try:
+                run = {"threads": run_threads, "processes": run_processes, "shm": run_shm_processes}[mode]
+                result, dt, _ = await run(workers, engine, executor)
+
+            finally:
+                executor.shutdown()
 
-    print(f"\n Результат правильный: {sync_result == expected}") # проверка что все норм посчиталось, необязательно но красиво
+        correct = correct and result == expected
 
-    print(f" Выполнилось за {sync_time:.4f} сек")
+        if i >= warmup:
+            startup.append(start_dt)
+            compute.append(dt)
+
+    return {
+        "engine": engine,
+        "mode": mode,
+        "workers": workers if mode != "sync" else 1,
+        "correct": correct,
+        "startup": describe(startup),
+        "compute": describe(compute),
+    }
+
+
+def machine_info() -> dict:
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+
+    except OSError:
+        commit = None
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__ if np is not None else None,
+        "commit": commit,
+    }
+
+
+def parse_args():
 
     cpu_workers = os.cpu_count() or 4
-    candidate_workers = {1, 2, 4, 8, cpu_workers}
-    worker_values = sorted(w for w in candidate_workers if w > 0)
+    default_workers = sorted({1, 2, 4, 8, cpu_workers})
 
-    print(worker_values)
+    parser = argparse.ArgumentParser(description="Сумма квадратов: синхронно, потоки, процессы - с замерами")
+    parser.add_argument("--n", type=int, default=N, help="до какого числа считаем")
+    parser.add_argument("--workers", default=",".join(map(str, default_workers)), help="числа воркеров через запятую")
+    parser.add_argument("--engines", default=",".join(ENGINES), help=f"через запятую из: {', '.join(ENGINES)}")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"через запятую из: {', '.join(MODES)}")
+    parser.add_argument("--warmup", type=int, default=1, help="прогревочных прогонов, в статистику не идут")
+    parser.add_argument("--repeat", type=int, default=5, help="прогонов с замером")
+    parser.add_argument("--json", help="куда сохранить результаты в JSON")
+    args = parser.parse_args()
 
-  # для сравнения
-    for workers in worker_values:
+    args.workers = [int(w) for w in args.workers.split(",")]
+    args.engines = args.engines.split(",")
+    args.modes = args.modes.split(",")
 
-        # Потоки
-        threads_result, threads_time, threads_workers = await run_threads(workers)
+    unknown = [e for e in args.engines if e not in ENGINES] + [m for m in args.modes if m not in MODES]
+    if unknown:
+        parser.error(f"неизвестные движки/режимы: {', '.join(unknown)}")
 
-        print(f" Число потоков: {threads_workers}")
-        print(f" Результат корректен: {threads_result == expected}")
-        print(f" Время выполнения: {threads_time:.4f} сек")
+    if args.n <= 0 or args.repeat <= 0 or args.warmup < 0 or min(args.workers) <= 0:
+        parser.error("n, repeat и воркеры должны быть положительными, warmup - не меньше 0")
 
-        # Процессы
-        processes_result, processes_time, processes_workers = await run_processes(workers)
+    return args
 
-        print(f" Число процессов: {processes_workers}")
-        print(f"Проверка результата: {processes_result == expected}")
-        print(f" Время выполнения: {processes_time:.4f} сек")
 
-        all_equal = (
-            sync_result == threads_result == processes_result == expected
-        )
+async def main():
+    global N
+
+    args = parse_args()
+    N = args.n
+
+    info = machine_info()
+    print(f"N = {N}, прогрев {args.warmup}, замеров {args.repeat}, CPU {info['cpu_count']}, Python {info['python']}")
+    print("Время в мс: запуск пула (медиана) и счёт\n")
+    print(f"  {'движок':8} {'режим':10} {'ворк.':>5} {'запуск':>8} {'min':>9} {'median':>9} {'p95':>9} {'stddev':>8}  верно")
+
+    results = []
+
+    try:
+        # по числу воркеров снаружи: тёплый пул пересоздаётся, только когда оно меняется
+        for workers in args.workers:
+            for engine in args.engines:
+                for mode in args.modes:
+
+                    # синхронному варианту число воркеров ни к чему - один прогон
+                    if mode == "sync" and workers != args.workers[0]:
+                        continue
+
+                    row = await measure(engine, mode, workers, args.warmup, args.repeat)
+                    results.append(row)
+
+                    c = row["compute"]
+                    print(
+                        f"  {engine:8} {mode:10} {row['workers']:5d} {row['startup']['median'] * 1000:8.2f} "
+                        f"{c['min'] * 1000:9.3f} {c['median'] * 1000:9.3f} {c['p95'] * 1000:9.3f} {c['stddev'] * 1000:8.3f}  "
+                        f"{'да' if row['correct'] else 'НЕТ'}"
+                    )
+
+    finally:
+        warm_pool.close()
+
+    if "warm" in args.modes:
+        print("\nЧанк (чисел) по замерам: " + ", ".join(
+            f"{engine} {int(TARGET_CHUNK_SECONDS / per_item) if per_item > 0 else '-'}"
+            for engine, per_item in chunk_tuner.per_item.items()
+        ))
+
+    if args.json:
+
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"n": N, "warmup": args.warmup, "repeat": args.repeat, "machine": info, "results": results},
+                f, indent=2, ensure_ascii=False,
+            )
 
-        print("\n выполнилось при num_workers =", workers)
-        print(f"  Синхронно : {sync_time:.4f}")
-        print(f"  Потоки    : {threads_time:.4f}")
-        print(f"  Процессы  : {processes_time:.4f}")
+        print(f"\nСохранил в {args.json}")
 
 
 